@@ -0,0 +1,87 @@
+# Условные GET-запросы. Ответ получает валидаторы ETag и Last-Modified, а
+# на повторный запрос с If-None-Match или If-Modified-Since, если данные не
+# изменились, возвращается 304 без тела: ответ даже не сериализуется.
+#
+# ETag слабый (W/): он считается по версии данных, а не по байтам ответа.
+
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable
+
+from fastapi import Request, Response, status
+
+# Ответы зависят от пользователя: общие кеши их не хранят, а браузер
+# каждый раз перепроверяет копию.
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # Слабое сравнение: префикс W/ не учитывается.
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _http_date(value: datetime) -> datetime:
+    # В базе время хранится в UTC без зоны, в HTTP точность до секунды.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+class Validators:
+    def __init__(
+        self, etag: str, last_modified: datetime | None = None
+    ) -> None:
+        self.etag = etag
+        self.last_modified = (
+            _http_date(last_modified) if last_modified is not None else None
+        )
+
+    def headers(self) -> dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(
+                self.last_modified, usegmt=True
+            )
+        return headers
+
+    def is_fresh(self, request: Request) -> bool:
+        # If-Modified-Since проверяется, только если нет If-None-Match.
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.etag)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return self.last_modified <= since
+
+    def response(
+        self, request: Request, render: Callable[[], Response]
+    ) -> Response:
+        # render вызывается, только если клиенту нужно тело.
+        if self.is_fresh(request):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers=self.headers(),
+            )
+        response = render()
+        response.headers.update(self.headers())
+        return response
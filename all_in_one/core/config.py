@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -11,15 +14,238 @@ class Settings(BaseSettings):
     REFRESH_TOKEN_EXPIRE_DAY: int = Field(
         default=7, validation_alias="REFRESH_TOKEN_EXPIRE_DAY"
     )
+    # Флаг Secure у всех cookie API. Отключать только для локальной
+    # разработки по http.
+    COOKIE_SECURE: bool = Field(default=True, validation_alias="COOKIE_SECURE")
+    # Токен для /metrics и /api/internal/*: передается в заголовке
+    # Authorization: Bearer <токен>. Пока он не задан, эти эндпоинты
+    # отвечают 404.
+    INTERNAL_API_TOKEN: str | None = Field(
+        default=None, validation_alias="INTERNAL_API_TOKEN"
+    )
     ASYNC_DATABASE_URL: str = Field(
         default=..., validation_alias="ASYNC_DATABASE_URL"
     )
     SYNC_DATABASE_URL: str = Field(
         default=..., validation_alias="SYNC_DATABASE_URL"
     )
+    DB_ECHO: bool = Field(default=False, validation_alias="DB_ECHO")
+    DB_POOL_SIZE: int = Field(default=10, validation_alias="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(
+        default=20, validation_alias="DB_MAX_OVERFLOW"
+    )
+    DB_POOL_TIMEOUT: float = Field(
+        default=30, validation_alias="DB_POOL_TIMEOUT"
+    )
+    DB_POOL_RECYCLE: int = Field(
+        default=1800, validation_alias="DB_POOL_RECYCLE"
+    )
+    DB_POOL_PRE_PING: bool = Field(
+        default=True, validation_alias="DB_POOL_PRE_PING"
+    )
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = Field(
+        default=100, validation_alias="DB_PREPARED_STATEMENT_CACHE_SIZE"
+    )
+    REPLICA_DATABASE_URL: str | None = Field(
+        default=None, validation_alias="REPLICA_DATABASE_URL"
+    )
+    REPLICA_MAX_LAG_SECONDS: float = Field(
+        default=5, validation_alias="REPLICA_MAX_LAG_SECONDS"
+    )
+    REPLICA_LAG_CHECK_SECONDS: float = Field(
+        default=1, validation_alias="REPLICA_LAG_CHECK_SECONDS"
+    )
+    # Сколько секунд после записи клиент читает из primary
+    READ_YOUR_WRITES_SECONDS: int = Field(
+        default=5, validation_alias="READ_YOUR_WRITES_SECONDS"
+    )
     TELEGRAM_BOT_TOKEN: str = Field(
         default=..., validation_alias="TELEGRAM_BOT_TOKEN"
     )
+    # Например http://localhost:8081/bot для локального фейкового Bot API
+    TELEGRAM_API_BASE_URL: str | None = Field(
+        default=None, validation_alias="TELEGRAM_API_BASE_URL"
+    )
+    TELEGRAM_GLOBAL_RATE: float = Field(
+        default=30, validation_alias="TELEGRAM_GLOBAL_RATE"
+    )
+    TELEGRAM_PER_CHAT_INTERVAL_SECONDS: float = Field(
+        default=1, validation_alias="TELEGRAM_PER_CHAT_INTERVAL_SECONDS"
+    )
+    TELEGRAM_SEND_CONCURRENCY: int = Field(
+        default=8, validation_alias="TELEGRAM_SEND_CONCURRENCY"
+    )
+    TELEGRAM_SEND_MAX_RETRIES: int = Field(
+        default=5, validation_alias="TELEGRAM_SEND_MAX_RETRIES"
+    )
+    TELEGRAM_OUTBOX_MAXSIZE: int = Field(
+        default=10000, validation_alias="TELEGRAM_OUTBOX_MAXSIZE"
+    )
+    # polling - бот сам опрашивает Telegram, webhook - Telegram присылает
+    # обновления на /api/telegram/webhook/
+    # disabled: бот не запускается, например в бенчмарках и тестах
+    TELEGRAM_MODE: Literal["polling", "webhook", "disabled"] = Field(
+        default="polling", validation_alias="TELEGRAM_MODE"
+    )
+    TELEGRAM_WEBHOOK_URL: str | None = Field(
+        default=None, validation_alias="TELEGRAM_WEBHOOK_URL"
+    )
+    TELEGRAM_WEBHOOK_SECRET: str | None = Field(
+        default=None, validation_alias="TELEGRAM_WEBHOOK_SECRET"
+    )
+    TELEGRAM_UPDATE_QUEUE_SIZE: int = Field(
+        default=1000, validation_alias="TELEGRAM_UPDATE_QUEUE_SIZE"
+    )
+    TELEGRAM_UPDATE_WORKERS: int = Field(
+        default=8, validation_alias="TELEGRAM_UPDATE_WORKERS"
+    )
+    # Число процессов API, ту же переменную читают uvicorn и gunicorn. В
+    # режиме webhook бот работает в каждом процессе, и TELEGRAM_GLOBAL_RATE
+    # делится между ними поровну.
+    WEB_CONCURRENCY: int = Field(
+        default=1, ge=1, validation_alias="WEB_CONCURRENCY"
+    )
+    TELEGRAM_LEADER_LOCK_KEY: int = Field(
+        default=7_340_001, validation_alias="TELEGRAM_LEADER_LOCK_KEY"
+    )
+    TELEGRAM_LEADER_CHECK_SECONDS: float = Field(
+        default=5, validation_alias="TELEGRAM_LEADER_CHECK_SECONDS"
+    )
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = Field(
+        default="thread", validation_alias="PASSWORD_HASH_EXECUTOR"
+    )
+    PASSWORD_HASH_WORKERS: int | None = Field(
+        default=None, validation_alias="PASSWORD_HASH_WORKERS"
+    )
+    PASSWORD_HASH_MAX_QUEUE: int = Field(
+        default=64, validation_alias="PASSWORD_HASH_MAX_QUEUE"
+    )
+    REVOCATION_SYNC_INTERVAL_SECONDS: float = Field(
+        default=5, validation_alias="REVOCATION_SYNC_INTERVAL_SECONDS"
+    )
+    # Насколько фоновые синхронизации перечитывают строки, измененные до
+    # прошлой синхронизации: покрывает транзакции, закоммиченные позже,
+    # чем началась запись.
+    SYNC_OVERLAP_SECONDS: float = Field(
+        default=60, validation_alias="SYNC_OVERLAP_SECONDS"
+    )
+    REVOKED_TOKENS_PURGE_INTERVAL_SECONDS: float = Field(
+        default=3600, validation_alias="REVOKED_TOKENS_PURGE_INTERVAL_SECONDS"
+    )
+    REGISTRATION_TOKEN_TTL_MINUTES: int = Field(
+        default=60, validation_alias="REGISTRATION_TOKEN_TTL_MINUTES"
+    )
+    REGISTRATION_TOKENS_PURGE_INTERVAL_SECONDS: float = Field(
+        default=3600,
+        validation_alias="REGISTRATION_TOKENS_PURGE_INTERVAL_SECONDS",
+    )
+    PURGE_CHUNK_SIZE: int = Field(
+        default=1000, validation_alias="PURGE_CHUNK_SIZE"
+    )
+    USER_CACHE_MAXSIZE: int = Field(
+        default=10000, validation_alias="USER_CACHE_MAXSIZE"
+    )
+    USER_CACHE_TTL_SECONDS: float = Field(
+        default=30, validation_alias="USER_CACHE_TTL_SECONDS"
+    )
+    # Пауза перед переподключением подписки на события воркеров и
+    # интервал проверки ее соединения.
+    BROADCAST_RECONNECT_SECONDS: float = Field(
+        default=5, validation_alias="BROADCAST_RECONNECT_SECONDS"
+    )
+    LIKE_COUNTER_FLUSH_INTERVAL_MS: int = Field(
+        default=500, validation_alias="LIKE_COUNTER_FLUSH_INTERVAL_MS"
+    )
+    LIKE_COUNTER_RECONCILE_INTERVAL_SECONDS: float = Field(
+        default=3600,
+        validation_alias="LIKE_COUNTER_RECONCILE_INTERVAL_SECONDS",
+    )
+    LIKE_COUNTER_RECONCILE_CHUNK_SIZE: int = Field(
+        default=1000, validation_alias="LIKE_COUNTER_RECONCILE_CHUNK_SIZE"
+    )
+    # Пауза между поиском расхождений и их исправлением. Должна быть больше
+    # интервала сброса счетчиков с запасом на медленный сброс.
+    LIKE_COUNTER_RECONCILE_SETTLE_SECONDS: float = Field(
+        default=10, validation_alias="LIKE_COUNTER_RECONCILE_SETTLE_SECONDS"
+    )
+    TRENDING_HALF_LIFE_HOURS: float = Field(
+        default=6, validation_alias="TRENDING_HALF_LIFE_HOURS"
+    )
+    TRENDING_WINDOW_HOURS: float = Field(
+        default=72, validation_alias="TRENDING_WINDOW_HOURS"
+    )
+    TRENDING_SYNC_INTERVAL_SECONDS: float = Field(
+        default=5, validation_alias="TRENDING_SYNC_INTERVAL_SECONDS"
+    )
+    TRENDING_REBUILD_INTERVAL_SECONDS: float = Field(
+        default=3600, validation_alias="TRENDING_REBUILD_INTERVAL_SECONDS"
+    )
+    SEARCH_MAX_CANDIDATES: int = Field(
+        default=500, validation_alias="SEARCH_MAX_CANDIDATES"
+    )
+    SEARCH_SYNC_INTERVAL_SECONDS: float = Field(
+        default=5, validation_alias="SEARCH_SYNC_INTERVAL_SECONDS"
+    )
+    SEARCH_REBUILD_INTERVAL_SECONDS: float = Field(
+        default=3600, validation_alias="SEARCH_REBUILD_INTERVAL_SECONDS"
+    )
+    MEDIA_STORAGE_BACKEND: Literal["local"] = Field(
+        default="local", validation_alias="MEDIA_STORAGE_BACKEND"
+    )
+    MEDIA_ROOT: str = Field(default="media", validation_alias="MEDIA_ROOT")
+    MEDIA_URL_PREFIX: str = Field(
+        default="/api/media/files/", validation_alias="MEDIA_URL_PREFIX"
+    )
+    UPLOAD_CHUNK_SIZE_BYTES: int = Field(
+        default=1024 * 1024, validation_alias="UPLOAD_CHUNK_SIZE_BYTES"
+    )
+    UPLOAD_MAX_BYTES: int = Field(
+        default=200 * 1024 * 1024, validation_alias="UPLOAD_MAX_BYTES"
+    )
+    # Очереди воркера и сколько задач каждой из них выполнять параллельно,
+    # например JOBS_QUEUES='{"default": 4, "telegram": 2}'
+    JOBS_QUEUES: dict[str, int] = Field(
+        default={"default": 4}, validation_alias="JOBS_QUEUES"
+    )
+    # Запускать воркер внутри каждого процесса API. Так задачи выполняются и
+    # при деплое одним контейнером с uvicorn. При отдельных контейнерах с
+    # python -m all_in_one.modules.jobs выключается: JOBS_RUN_IN_API=false.
+    JOBS_RUN_IN_API: bool = Field(
+        default=True, validation_alias="JOBS_RUN_IN_API"
+    )
+    JOBS_POLL_INTERVAL_SECONDS: float = Field(
+        default=5, validation_alias="JOBS_POLL_INTERVAL_SECONDS"
+    )
+    JOBS_MAX_ATTEMPTS: int = Field(
+        default=5, validation_alias="JOBS_MAX_ATTEMPTS"
+    )
+    JOBS_RETRY_BASE_SECONDS: float = Field(
+        default=5, validation_alias="JOBS_RETRY_BASE_SECONDS"
+    )
+    JOBS_RETRY_MAX_SECONDS: float = Field(
+        default=3600, validation_alias="JOBS_RETRY_MAX_SECONDS"
+    )
+    JOBS_LOCK_TIMEOUT_SECONDS: float = Field(
+        default=600, validation_alias="JOBS_LOCK_TIMEOUT_SECONDS"
+    )
+    JOBS_RETENTION_HOURS: float = Field(
+        default=24, validation_alias="JOBS_RETENTION_HOURS"
+    )
+    JOBS_SHUTDOWN_TIMEOUT_SECONDS: float = Field(
+        default=30, validation_alias="JOBS_SHUTDOWN_TIMEOUT_SECONDS"
+    )
+    # Сколько строк за раз выгрузка данных читает из курсора на сервере БД.
+    EXPORT_YIELD_PER: int = Field(
+        default=1000, validation_alias="EXPORT_YIELD_PER"
+    )
+    # Поиск N+1 для разработки: считать одинаковые SQL-запросы в каждом
+    # запросе к API и предупреждать, если какой-то повторился чаще порога.
+    N_PLUS_ONE_DETECTION: bool = Field(
+        default=False, validation_alias="N_PLUS_ONE_DETECTION"
+    )
+    N_PLUS_ONE_THRESHOLD: int = Field(
+        default=10, validation_alias="N_PLUS_ONE_THRESHOLD"
+    )
 
     class Config:
         env_file = ".env"
@@ -27,4 +253,17 @@ class Settings(BaseSettings):
         extra = "allow"
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class _LazySettings:
+    # Settings() читает окружение и .env при первом обращении к настройкам, а
+    # не при импорте модуля, поэтому модули можно импортировать без них.
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+
+settings: Settings = _LazySettings()
@@ -1,18 +1,183 @@
-import os
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-# Получение строки подключения
-DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+from .config import settings
+from .metrics import instrument_engine
 
-# Создание асинхронного движка
-engine = create_async_engine(DATABASE_URL, echo=True)
 
-# создаем фабрику async_session для работы с асинхронными запросами к БД
-async_session = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+class PoolWaitStats:
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, waited: float, timed_out: bool) -> None:
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg": (
+                self.wait_total / self.checkouts if self.checkouts else 0.0
+            ),
+            "wait_max": self.wait_max,
+        }
+
+
+# Статистика вынесена из пула: при обрыве соединений SQLAlchemy пересоздает
+# пул, а накопленные значения терять не хотим.
+pool_wait_stats = PoolWaitStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    # Пул, который замеряет, сколько запрос ждал свободное соединение.
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = True
+        try:
+            connection = super()._do_get()
+            timed_out = False
+            return connection
+        finally:
+            pool_wait_stats.observe(time.perf_counter() - started, timed_out)
+
+
+def _database_url(raw_url: str):
+    url = make_url(raw_url)
+    if url.get_driver_name() == "asyncpg":
+        url = url.update_query_dict(
+            {
+                "prepared_statement_cache_size": str(
+                    settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+                )
+            }
+        )
+    return url
+
+
+def _create_engine(raw_url: str, poolclass) -> AsyncEngine:
+    engine = create_async_engine(
+        _database_url(raw_url),
+        echo=settings.DB_ECHO,
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    instrument_engine(engine)
+    return engine
+
+
+# Движок и фабрика сессий создаются при первом обращении, а не при импорте:
+# модели и утилиты можно импортировать без настроек и подключения к БД.
+@lru_cache
+def get_engine() -> AsyncEngine:
+    return _create_engine(settings.ASYNC_DATABASE_URL, InstrumentedQueuePool)
+
+
+@lru_cache
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(
+        get_engine(), class_=AsyncSession, expire_on_commit=False
+    )
+
+
+# создаем сессию для работы с асинхронными запросами к БД
+def async_session() -> AsyncSession:
+    return get_sessionmaker()()
+
+
+# Реплика необязательна: без REPLICA_DATABASE_URL все чтения идут в primary.
+# Ожидание соединений меряем только у primary, у реплики обычный пул.
+@lru_cache
+def get_replica_engine() -> AsyncEngine | None:
+    if not settings.REPLICA_DATABASE_URL:
+        return None
+    return _create_engine(settings.REPLICA_DATABASE_URL, AsyncAdaptedQueuePool)
+
+
+@lru_cache
+def get_replica_sessionmaker() -> sessionmaker | None:
+    engine = get_replica_engine()
+    if engine is None:
+        return None
+    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def replica_session() -> AsyncSession:
+    return get_replica_sessionmaker()()
+
 
 # Базовый класс для моделей
 Base = declarative_base()
+
+
+def pool_status() -> dict:
+    pool = get_engine().pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        **pool_wait_stats.as_dict(),
+    }
+
+
+# Удаление строк порциями: каждая порция в своей короткой транзакции, чтобы
+# не держать блокировки и не раздувать WAL одним большим DELETE.
+async def delete_in_chunks(
+    db: AsyncSession, model, condition, chunk_size: int
+) -> int:
+    deleted = 0
+    while True:
+        chunk = select(model.id).where(condition).limit(chunk_size)
+        result = await db.execute(delete(model).where(model.id.in_(chunk)))
+        await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < chunk_size:
+            return deleted
+
+
+# Время сервера БД в UTC без таймзоны, как в колонках моделей. Отметки, по
+# которым другие воркеры ищут изменения, ставим по часам БД: они одни на
+# все процессы.
+def db_utcnow():
+    return func.timezone("UTC", func.now())
+
+
+class ChangeWindow:
+    # Нижняя граница инкрементальной синхронизации по времени изменения
+    # строк. Id и время выдаются до коммита, и строки становятся видны не в
+    # том порядке, поэтому граница отстает от начала прошлой синхронизации
+    # на overlap секунд, а строки из перекрытия читаются повторно.
+
+    def __init__(self, overlap: float) -> None:
+        self.overlap = overlap
+        self.since: datetime | None = None
+
+    async def start(self, db: AsyncSession) -> datetime:
+        return (await db.execute(select(db_utcnow()))).scalar_one()
+
+    def advance(self, started: datetime) -> None:
+        self.since = started - timedelta(seconds=self.overlap)
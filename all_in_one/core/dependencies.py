@@ -1,11 +1,26 @@
 from typing import AsyncGenerator
 
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .db import async_session
+from .db import async_session, replica_session
+from .replica import get_replica_monitor
 
 
 # Функция для получения сессии базы данных
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
+
+
+# Сессия для чтения. Когда реплика недоступна, отстает, запрос изменяющий
+# или клиент только что писал, отдаем ту же сессию primary, что и get_db:
+# FastAPI кеширует зависимости в пределах запроса, второго соединения нет.
+async def get_read_db(
+    request: Request, db: AsyncSession = Depends(get_db)
+) -> AsyncGenerator[AsyncSession, None]:
+    if not get_replica_monitor().use_replica(request.method, request.cookies):
+        yield db
+        return
+    async with replica_session() as session:
+        yield session
@@ -0,0 +1,319 @@
+# Метрики в текстовом формате Prometheus: время ответа по маршрутам,
+# количество и время SQL-запросов на каждый запрос к API.
+
+
+import bisect
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+
+from .config import settings
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, value in self._values.items():
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labels)} "
+                f"{_format_value(value)}"
+            )
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [счетчики по корзинам (последняя +Inf), сумма, количество]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self._values[labels] = series
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*self.buckets, float("inf")), counts
+            ):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(
+                    (*self.labelnames, "le"), (*labels, _format_value(bound))
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = _format_labels(self.labelnames, labels)
+            lines.append(
+                f"{self.name}_sum{series_labels} {_format_value(total)}"
+            )
+            lines.append(f"{self.name}_count{series_labels} {count}")
+        return lines
+
+
+def sample(
+    name: str, documentation: str, value: float, metric_type: str = "gauge"
+) -> list[str]:
+    # Одиночное значение для collector-функций: состояние пулов, кешей и
+    # т.п., которое хранится в самих объектах и читается при отдаче метрик.
+    return [
+        f"# HELP {name} {documentation}",
+        f"# TYPE {name} {metric_type}",
+        f"{name} {_format_value(value)}",
+    ]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors: list[Callable[[], list[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], list[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Время обработки запроса по маршрутам",
+        ("route", "method"),
+    )
+)
+REQUESTS_TOTAL = registry.register(
+    Counter(
+        "http_requests_total",
+        "Количество запросов по маршрутам и кодам ответа",
+        ("route", "method", "status"),
+    )
+)
+REQUEST_DB_STATEMENTS = registry.register(
+    Histogram(
+        "http_request_db_statements",
+        "Количество SQL-запросов на один запрос к API",
+        ("route",),
+        buckets=STATEMENT_BUCKETS,
+    )
+)
+REQUEST_DB_TIME = registry.register(
+    Histogram(
+        "http_request_db_seconds",
+        "Суммарное время SQL-запросов на один запрос к API",
+        ("route",),
+    )
+)
+DB_STATEMENTS_TOTAL = registry.register(
+    Counter("db_statements_total", "Всего выполнено SQL-запросов")
+)
+REPEATED_STATEMENTS_TOTAL = registry.register(
+    Counter(
+        "http_request_repeated_statements_total",
+        "Запросы к API с подозрением на N+1: один и тот же SQL больше "
+        "N_PLUS_ONE_THRESHOLD раз",
+        ("route",),
+    )
+)
+
+# Списки параметров разной длины ($1, $2, ... или ?, ?, ...) сводим к
+# одному виду, чтобы IN с разным числом значений считался тем же запросом.
+PARAMETER = r"(?:\$\d+|\?|%s)"
+PARAMETER_LIST = re.compile(rf"{PARAMETER}(?:\s*,\s*{PARAMETER})*")
+
+
+class QueryStats:
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self, track_statements: bool = False) -> None:
+        self.count = 0
+        self.duration = 0.0
+        # Счетчик одинаковых запросов только для поиска N+1: в обычном
+        # режиме тексты запросов не храним.
+        self.statements: dict[str, int] | None = (
+            {} if track_statements else None
+        )
+
+    def observe(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+        if self.statements is not None:
+            key = PARAMETER_LIST.sub("?", statement)
+            self.statements[key] = self.statements.get(key, 0) + 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        if not self.statements:
+            return []
+        return [
+            (statement, count)
+            for statement, count in self.statements.items()
+            if count > threshold
+        ]
+
+
+# Статистика SQL текущего запроса. SQLAlchemy выполняет драйвер в greenlet
+# с тем же контекстом, поэтому события движка видят значение из middleware.
+current_query_stats: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_STATEMENTS_TOTAL.inc()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.observe(statement, elapsed)
+
+
+def instrument_engine(engine) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    # Чистый ASGI middleware: не буферизует ответ и не создает лишних задач,
+    # в отличие от BaseHTTPMiddleware.
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(track_statements=settings.N_PLUS_ONE_DETECTION)
+        token = current_query_stats.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            current_query_stats.reset(token)
+            # Имя маршрута (name= в декораторе) FastAPI кладет в scope при
+            # сопоставлении пути.
+            route = scope.get("route")
+            route_name = getattr(route, "name", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.observe(duration, (route_name, method))
+            REQUESTS_TOTAL.inc((route_name, method, str(status_code)))
+            REQUEST_DB_STATEMENTS.observe(stats.count, (route_name,))
+            REQUEST_DB_TIME.observe(stats.duration, (route_name,))
+            report_repeated_statements(route_name, method, stats)
+
+
+def report_repeated_statements(
+    route_name: str, method: str, stats: QueryStats
+) -> None:
+    repeated = stats.repeated(settings.N_PLUS_ONE_THRESHOLD)
+    if not repeated:
+        return
+    REPEATED_STATEMENTS_TOTAL.inc((route_name,))
+    for statement, count in repeated:
+        logging.warning(
+            f"Возможен N+1 в {method} {route_name}: запрос выполнен "
+            f"{count} раз из {stats.count}: {statement}"
+        )
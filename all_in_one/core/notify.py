@@ -0,0 +1,91 @@
+# Рассылка событий между воркерами API через LISTEN/NOTIFY Postgres.
+# Событие отправляется в транзакции, которая меняет данные, и доставляется
+# всем процессам только после ее коммита. Пока подписка оборвана, события
+# теряются, поэтому при каждом подключении вызываются обработчики
+# on_connect: они сбрасывают то, что могло устареть за время разрыва.
+
+
+import asyncio
+import contextlib
+import logging
+from functools import lru_cache
+from typing import Callable
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db import get_engine
+
+
+async def publish(db: AsyncSession, channel: str, payload: str) -> None:
+    await db.execute(select(func.pg_notify(channel, payload)))
+
+
+class Broadcaster:
+    def __init__(self, reconnect_interval: float) -> None:
+        self.reconnect_interval = reconnect_interval
+        self._handlers: dict[str, Callable[[str], None]] = {}
+        self._on_connect: list[Callable[[], None]] = []
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        self._handlers[channel] = handler
+
+    def on_connect(self, handler: Callable[[], None]) -> None:
+        self._on_connect.append(handler)
+
+    def _dispatch(self, connection, pid, channel, payload) -> None:
+        try:
+            self._handlers[channel](payload)
+        except Exception:
+            logging.exception(f"Ошибка в обработчике события {channel}")
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                connection = await get_engine().connect()
+                try:
+                    raw_connection = await connection.get_raw_connection()
+                    driver = raw_connection.driver_connection
+                    if not hasattr(driver, "add_listener"):
+                        logging.warning(
+                            "LISTEN недоступен, события между воркерами "
+                            "не рассылаются"
+                        )
+                        return
+                    for channel in self._handlers:
+                        await driver.add_listener(channel, self._dispatch)
+                    for handler in self._on_connect:
+                        handler()
+                    while True:
+                        await asyncio.sleep(self.reconnect_interval)
+                        await connection.execute(text("SELECT 1"))
+                        await connection.commit()
+                finally:
+                    # Соединение с подпиской не возвращаем в пул.
+                    with contextlib.suppress(Exception):
+                        await connection.invalidate()
+                    await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Ошибка подписки на события воркеров")
+            await asyncio.sleep(self.reconnect_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(), name="broadcast")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+@lru_cache
+def get_broadcaster() -> Broadcaster:
+    return Broadcaster(settings.BROADCAST_RECONNECT_SECONDS)
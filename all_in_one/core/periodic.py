@@ -0,0 +1,37 @@
+import asyncio
+import contextlib
+import logging
+from typing import Awaitable, Callable
+
+
+class PeriodicTask:
+    # Фоновая задача, которая вызывает корутину раз в interval секунд.
+    # Ошибки логируются и не останавливают цикл.
+
+    def __init__(
+        self, name: str, interval: float, func: Callable[[], Awaitable[None]]
+    ) -> None:
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.func()
+            except Exception:
+                logging.exception(f"Ошибка в фоновой задаче {self.name}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
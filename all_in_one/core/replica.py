@@ -0,0 +1,130 @@
+# Чтение с реплики. Запросы только на чтение получают сессию реплики, если
+# она настроена, отстает не больше REPLICA_MAX_LAG_SECONDS и клиент
+# недавно ничего не записывал. Иначе чтение идет в primary.
+#
+# Read-your-writes держится на cookie: после успешного изменяющего запроса
+# клиент READ_YOUR_WRITES_SECONDS секунд читает из primary. Cookie работает
+# при любом числе воркеров, общее состояние между процессами не нужно.
+
+
+import logging
+import time
+from functools import lru_cache
+
+from sqlalchemy import text
+
+from .config import settings
+from .db import get_replica_engine
+
+READ_PRIMARY_COOKIE = "read_primary"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+
+class ReplicaLagMonitor:
+    def __init__(self, max_lag: float, check_interval: float) -> None:
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: float | None = None
+        self.checked_at = 0.0
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    @property
+    def healthy(self) -> bool:
+        # Если проверки перестали проходить, последнему значению не верим.
+        fresh = time.monotonic() - self.checked_at <= 3 * self.check_interval
+        return fresh and self.lag is not None and self.lag <= self.max_lag
+
+    async def check(self) -> None:
+        engine = get_replica_engine()
+        if engine is None:
+            return
+        try:
+            async with engine.connect() as connection:
+                lag = (await connection.execute(LAG_QUERY)).scalar()
+        except Exception:
+            self.lag = None
+            logging.exception("Не удалось проверить отставание реплики")
+            return
+        self.lag = float(lag)
+        self.checked_at = time.monotonic()
+
+    def use_replica(self, method: str, cookies: dict) -> bool:
+        # В изменяющих запросах читаем из primary: загруженные объекты
+        # остаются в той же сессии, через которую потом идет запись.
+        use = (
+            get_replica_engine() is not None
+            and method in SAFE_METHODS
+            and READ_PRIMARY_COOKIE not in cookies
+            and self.healthy
+        )
+        if use:
+            self.replica_reads += 1
+        else:
+            self.primary_reads += 1
+        return use
+
+    def stats(self) -> dict:
+        return {
+            "configured": get_replica_engine() is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+@lru_cache
+def get_replica_monitor() -> ReplicaLagMonitor:
+    return ReplicaLagMonitor(
+        max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+        check_interval=settings.REPLICA_LAG_CHECK_SECONDS,
+    )
+
+
+class ReadYourWritesMiddleware:
+    # Чистый ASGI middleware: после успешного изменяющего запроса ставит
+    # cookie, по которой get_read_db отправляет чтения клиента в primary.
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or not settings.REPLICA_DATABASE_URL
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}=1; "
+                    f"Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                if settings.COOKIE_SECURE:
+                    cookie += "; Secure"
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", cookie.encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
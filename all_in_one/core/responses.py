@@ -0,0 +1,53 @@
+import os
+from typing import Any
+
+import anyio
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+PATHSEND_EXTENSION = "http.response.pathsend"
+
+
+class PydanticJSONResponse(JSONResponse):
+    # Сериализует ответ сразу в байты через pydantic-core, без промежуточного
+    # jsonable_encoder и стандартного json. Pydantic-модель можно передать
+    # как content напрямую, в том числе внутри словаря или списка.
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return to_json(content)
+
+
+class PathSendFileResponse(FileResponse):
+    # Если ASGI-сервер объявил расширение http.response.pathsend (например,
+    # granian), файл целиком отдается путем, и сервер сам отправляет его
+    # через sendfile. Starlette этого не умеет, а uvicorn такого расширения
+    # не объявляет: там, как и для HEAD и Range, работает обычный
+    # FileResponse с чтением файла кусками.
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if (
+            PATHSEND_EXTENSION not in scope.get("extensions", {})
+            or scope["method"].upper() == "HEAD"
+            or "range" in Headers(scope=scope)
+        ):
+            return await super().__call__(scope, receive, send)
+        if self.stat_result is None:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            self.set_stat_headers(stat_result)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        await send({"type": PATHSEND_EXTENSION, "path": str(self.path)})
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,117 @@
+# Хранилище загруженных файлов. Бэкенд выбирается настройкой
+# MEDIA_STORAGE_BACKEND, по умолчанию локальный диск. Файл пишется потоком
+# кусками фиксированного размера, целиком в памяти он не держится.
+
+
+import contextlib
+import hashlib
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator
+
+import anyio
+
+from .config import settings
+
+# Ключи генерирует само приложение: uuid4 в hex и расширение. Все остальное
+# отклоняем, чтобы из ключа нельзя было выйти за пределы хранилища.
+KEY_PATTERN = re.compile(r"^[0-9a-f]{32}(\.[a-z0-9]{1,10})?$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class MeteredStream:
+    # Перекладывает входящий поток в куски chunk_size байт, по пути считает
+    # размер и sha256 и обрывает загрузку, как только превышен max_size.
+
+    def __init__(
+        self, stream: AsyncIterable[bytes], chunk_size: int, max_size: int
+    ) -> None:
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        buffer = bytearray()
+        async for data in self.stream:
+            self.size += len(data)
+            if self.size > self.max_size:
+                raise UploadTooLarge
+            self._digest.update(data)
+            buffer += data
+            while len(buffer) >= self.chunk_size:
+                yield bytes(buffer[: self.chunk_size])
+                del buffer[: self.chunk_size]
+        if buffer:
+            yield bytes(buffer)
+
+
+class Storage:
+    async def save(self, key: str, chunks: AsyncIterator[bytes]) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Path | None:
+        # Путь на диске для отдачи через FileResponse. Удаленные хранилища
+        # возвращают None и отдают файлы по своему url.
+        return None
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str, url_prefix: str) -> None:
+        self.root = Path(root)
+        self.url_prefix = url_prefix
+
+    def local_path(self, key: str) -> Path:
+        if not KEY_PATTERN.match(key):
+            raise ValueError(f"Недопустимый ключ файла: {key}")
+        # Раскладываем по подкаталогам, чтобы не копить все в одном.
+        return self.root / key[:2] / key
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}{key}"
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes]) -> None:
+        path = self.local_path(key)
+        partial_path = path.with_name(f"{path.name}.part")
+        await anyio.Path(path.parent).mkdir(parents=True, exist_ok=True)
+        try:
+            async with await anyio.open_file(partial_path, "wb") as file:
+                async for chunk in chunks:
+                    await file.write(chunk)
+            # Файл появляется под своим именем только целиком.
+            await anyio.to_thread.run_sync(os.replace, partial_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                partial_path.unlink()
+            raise
+
+    async def delete(self, key: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            await anyio.Path(self.local_path(key)).unlink()
+
+
+STORAGE_BACKENDS = {"local": LocalStorage}
+
+
+@lru_cache
+def get_storage() -> Storage:
+    backend = STORAGE_BACKENDS[settings.MEDIA_STORAGE_BACKEND]
+    return backend(
+        root=settings.MEDIA_ROOT, url_prefix=settings.MEDIA_URL_PREFIX
+    )
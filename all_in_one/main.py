@@ -1,35 +1,213 @@
-import asyncio
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from all_in_one.core.config import settings
 from all_in_one.core.cors import get_cors_middleware
-from all_in_one.modules.utils.telegram_bot import application, run_bot
+from all_in_one.core.db import async_session
+from all_in_one.core.metrics import MetricsMiddleware
+from all_in_one.core.notify import get_broadcaster
+from all_in_one.core.periodic import PeriodicTask
+from all_in_one.core.replica import (
+    ReadYourWritesMiddleware,
+    get_replica_monitor,
+)
+from all_in_one.core.responses import PydanticJSONResponse
+from all_in_one.modules.auth.dependencies import (
+    USER_CHANGED_CHANNEL,
+    get_user_cache,
+    invalidate_user,
+)
+from all_in_one.modules.auth.hashing import get_password_hasher
+from all_in_one.modules.auth.revocation import get_revocation_cache
+from all_in_one.modules.content.search import get_title_index
+from all_in_one.modules.content.trending import (
+    get_trending_index,
+    handle_like_removed,
+)
+from all_in_one.modules.jobs.worker import Worker, load_job_modules
+from all_in_one.modules.likes.counters import (
+    like_counter,
+    reconcile_like_counts,
+)
+from all_in_one.modules.likes.dependencies import LIKE_REMOVED_CHANNEL
+from all_in_one.modules.utils.bot_runner import get_bot_runner
 
 from .modules.auth.routers import router as auth_router
+from .modules.content.routers import router as content_router
+from .modules.export.routers import router as export_router
+from .modules.likes.routers import router as likes_router
+from .modules.monitoring.routers import router as monitoring_router
+from .modules.utils.telegram_webhook import router as telegram_router
+
+
+async def sync_revoked_tokens():
+    async with async_session() as db:
+        await get_revocation_cache().sync(db)
+
+
+async def flush_like_counter():
+    async with async_session() as db:
+        await like_counter.flush(db)
+
+
+async def reconcile_likes():
+    async with async_session() as db:
+        await like_counter.flush(db)
+        fixed = await reconcile_like_counts(
+            db,
+            settings.LIKE_COUNTER_RECONCILE_CHUNK_SIZE,
+            settings.LIKE_COUNTER_RECONCILE_SETTLE_SECONDS,
+        )
+    if fixed:
+        logging.info(f"Исправлено счетчиков лайков: {fixed}")
+
+
+async def sync_trending():
+    async with async_session() as db:
+        await get_trending_index().sync(db)
+
+
+async def rebuild_trending():
+    trending_index = get_trending_index()
+    async with async_session() as db:
+        await trending_index.rebuild(db)
+    logging.info(
+        f"Рейтинг популярных медиа пересобран: {trending_index.stats()}"
+    )
+
+
+async def sync_title_index():
+    async with async_session() as db:
+        await get_title_index().sync(db)
+
+
+async def rebuild_title_index():
+    title_index = get_title_index()
+    async with async_session() as db:
+        await title_index.rebuild(db)
+    logging.info(f"Поисковый индекс пересобран: {title_index.stats()}")
+
+
+async def check_replica_lag():
+    await get_replica_monitor().check()
+
+
+def build_periodic_tasks() -> list[PeriodicTask]:
+    tasks = [
+        PeriodicTask(
+            "revocation-sync",
+            settings.REVOCATION_SYNC_INTERVAL_SECONDS,
+            sync_revoked_tokens,
+        ),
+        PeriodicTask(
+            "like-counter-flush",
+            settings.LIKE_COUNTER_FLUSH_INTERVAL_MS / 1000,
+            flush_like_counter,
+        ),
+        PeriodicTask(
+            "like-counter-reconcile",
+            settings.LIKE_COUNTER_RECONCILE_INTERVAL_SECONDS,
+            reconcile_likes,
+        ),
+        PeriodicTask(
+            "trending-sync",
+            settings.TRENDING_SYNC_INTERVAL_SECONDS,
+            sync_trending,
+        ),
+        PeriodicTask(
+            "trending-rebuild",
+            settings.TRENDING_REBUILD_INTERVAL_SECONDS,
+            rebuild_trending,
+        ),
+        PeriodicTask(
+            "search-sync",
+            settings.SEARCH_SYNC_INTERVAL_SECONDS,
+            sync_title_index,
+        ),
+        PeriodicTask(
+            "search-rebuild",
+            settings.SEARCH_REBUILD_INTERVAL_SECONDS,
+            rebuild_title_index,
+        ),
+    ]
+    if settings.REPLICA_DATABASE_URL:
+        tasks.append(
+            PeriodicTask(
+                "replica-lag-check",
+                settings.REPLICA_LAG_CHECK_SECONDS,
+                check_replica_lag,
+            )
+        )
+    return tasks
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    bot_task = asyncio.create_task(run_bot())
+    # Настройки, движок БД и бот создаются здесь, а не при импорте модулей.
+    await sync_revoked_tokens()
+    await check_replica_lag()
+    await rebuild_trending()
+    await rebuild_title_index()
+    broadcaster = get_broadcaster()
+    broadcaster.subscribe(USER_CHANGED_CHANNEL, invalidate_user)
+    # Удаления лайков, пропущенные за время разрыва подписки, исправит
+    # ближайшая пересборка рейтинга.
+    broadcaster.subscribe(LIKE_REMOVED_CHANNEL, handle_like_removed)
+    broadcaster.on_connect(get_user_cache().clear)
+    broadcaster.start()
+    periodic_tasks = build_periodic_tasks()
+    for task in periodic_tasks:
+        task.start()
+    bot_runner = get_bot_runner()
+    bot_runner.start()
+    worker = None
+    if settings.JOBS_RUN_IN_API:
+        load_job_modules()
+        worker = Worker(
+            settings.JOBS_QUEUES, settings.JOBS_POLL_INTERVAL_SECONDS
+        )
+        worker.start()
 
     yield
 
-    await application.updater.stop()
-    await application.stop()
-    await application.shutdown()
-    await bot_task
-
+    if worker is not None:
+        await worker.stop(settings.JOBS_SHUTDOWN_TIMEOUT_SECONDS)
+    for task in periodic_tasks:
+        await task.stop()
+    await broadcaster.stop()
+    # Сбрасываем накопленные изменения счетчиков лайков перед остановкой.
+    await flush_like_counter()
+    await bot_runner.stop()
+    get_password_hasher().shutdown()
 
-app = FastAPI(title="All in One", lifespan=lifespan)
 
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title="All in One",
+        lifespan=lifespan,
+        default_response_class=PydanticJSONResponse,
+    )
 
-get_cors_middleware(app)
+    get_cors_middleware(app)
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(MetricsMiddleware)
 
-app.include_router(auth_router)
+    app.include_router(auth_router)
+    app.include_router(content_router)
+    app.include_router(likes_router)
+    app.include_router(export_router)
+    app.include_router(monitoring_router)
+    # Роутер webhook подключен всегда: пока бот не запущен в режиме
+    # webhook, он отвечает 404.
+    app.include_router(telegram_router)
+    return app
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "all_in_one.main:create_app", factory=True, host="0.0.0.0", port=8000
+    )
@@ -1,38 +1,85 @@
 # Тут указываются зависимости нашего проекта. Т.е. будем прописывать необходимую проверку данных. Для дальнейшего использования в представлениях.
 
 
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Annotated, Literal
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
+from ...core.cache import TTLCache
 from ...core.config import settings
-from ...core.dependencies import get_db
-from .models import RevokedToken, TokenForRegistrationTelegram, User
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from ...core.dependencies import get_db, get_read_db
+from ...core.notify import publish
+from .hashing import get_password_hasher
+from .models import TokenForRegistrationTelegram, User
+from .revocation import get_revocation_cache, token_expires_at
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password) -> bool:
+    return await get_password_hasher().verify(plain_password, hashed_password)
+
+
+async def get_password_hash(password) -> str:
+    return await get_password_hasher().hash(password)
+
+
+# Кешируем снимок колонок, а не сам ORM-объект: объект привязан к сессии
+# конкретного запроса и может меняться в ней.
+@lru_cache
+def get_user_cache() -> TTLCache:
+    return TTLCache(
+        maxsize=settings.USER_CACHE_MAXSIZE,
+        ttl=settings.USER_CACHE_TTL_SECONDS,
+    )
+
+
+def _user_snapshot(user: User) -> dict:
+    return {
+        column.key: getattr(user, column.key)
+        for column in User.__table__.columns
+    }
+
+
+# Кеш у каждого воркера свой. Изменение пользователя рассылается всем
+# воркерам через NOTIFY, а при обрыве подписки кеш сбрасывается целиком
+# (см. main.lifespan), поэтому отключенный пользователь не проходит
+# проверку дольше, чем доставляется событие.
+USER_CHANGED_CHANNEL = "user_changed"
+
 
+def invalidate_user(username: str) -> None:
+    get_user_cache().pop(username)
 
-def get_password_hash(password) -> str:
-    return pwd_context.hash(password)
+
+async def publish_user_changed(db: AsyncSession, username: str) -> None:
+    # Вызывается до коммита изменения: событие уходит вместе с ним.
+    await publish(db, USER_CHANGED_CHANNEL, username)
 
 
 async def get_user(username: str, db: AsyncSession) -> User | None:
+    snapshot = get_user_cache().get(username)
+    if snapshot is not None:
+        # Восстанавливаем объект как уже загруженный и привязываем к сессии
+        # запроса без обращения к БД, чтобы его можно было менять и
+        # сохранять как обычно.
+        cached_user = User(**snapshot)
+        make_transient_to_detached(cached_user)
+        return await db.merge(cached_user, load=False)
+
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    get_user_cache().set(username, _user_snapshot(user))
     return user
 
 
@@ -52,7 +99,7 @@ async def authenticate_user(
     user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect password")
     return user
 
@@ -115,7 +162,8 @@ def verify_refresh_token(decoded_token: dict) -> bool:
 
 
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_read_db),
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -131,7 +179,11 @@ async def get_current_user(
             raise credentials_exception
     except (jwt.ExpiredSignatureError, jwt.DecodeError, jwt.InvalidTokenError):
         raise credentials_exception from None
-    if await is_token_revoked(token, db):
+    # Запись об отзыве живет в кеше до истечения токена, поэтому
+    # просроченный токен обязан отклоняться сам по себе.
+    if token_expires_at(payload) <= time.time():
+        raise credentials_exception
+    if is_token_revoked(token):
         raise credentials_exception
     user = await get_user(username=username, db=db)
     if user is None:
@@ -139,20 +191,12 @@ async def get_current_user(
     return user
 
 
-async def is_token_revoked(
-    token: str, db: AsyncSession
-) -> RevokedToken | None:
-    result = await db.execute(
-        select(RevokedToken).where(RevokedToken.token == token)
-    )
-    revoked_token = result.scalars().first()
+def is_token_revoked(token: str) -> bool:
+    return get_revocation_cache().is_revoked(token)
 
-    if revoked_token is None:
-        new_revoked_token = RevokedToken(token=token)
-        db.add(new_revoked_token)
-        await db.commit()
 
-    return revoked_token
+async def revoke_token(token: str, db: AsyncSession) -> None:
+    await get_revocation_cache().revoke(token, db)
 
 
 async def get_current_active_user(
@@ -169,7 +213,8 @@ async def check_registration_token(
     search_user = await db.execute(
         select(TokenForRegistrationTelegram).where(
             TokenForRegistrationTelegram.registration_token
-            == registration_token
+            == registration_token,
+            TokenForRegistrationTelegram.expires_at > datetime.utcnow(),
         )
     )
     token_data = search_user.scalar_one_or_none()
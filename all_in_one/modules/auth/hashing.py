@@ -0,0 +1,141 @@
+# Хеширование и проверка паролей. bcrypt тратит десятки миллисекунд CPU на
+# каждый вызов, поэтому работа уходит в отдельный пул потоков или процессов,
+# а event loop только ждет результат. Очередь ограничена: при перегрузке
+# сразу отдаем 503, а не копим запросы.
+
+
+import asyncio
+import os
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from ...core.config import settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _run_timed(func, *args) -> tuple[float, object]:
+    # Выполняется внутри воркера. time.monotonic общий для всех процессов
+    # системы, поэтому время ожидания в очереди считается и для пула
+    # процессов.
+    return time.monotonic(), func(*args)
+
+
+class HashingStats:
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {"hash": 0, "verify": 0}
+        self.rejected = 0
+        self.in_flight = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def observe(self, operation: str, queue_wait: float, latency: float):
+        self.calls[operation] += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self) -> dict:
+        completed = sum(self.calls.values())
+        return {
+            "calls": dict(self.calls),
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "queue_wait_avg": (
+                self.queue_wait_total / completed if completed else 0.0
+            ),
+            "queue_wait_max": self.queue_wait_max,
+            "latency_avg": (
+                self.latency_total / completed if completed else 0.0
+            ),
+            "latency_max": self.latency_max,
+        }
+
+
+class PasswordHasher:
+    def __init__(
+        self, executor_type: str, workers: int | None, max_queue: int
+    ) -> None:
+        self.executor_type = executor_type
+        self.workers = workers or os.cpu_count() or 1
+        # Одновременно в работе и в очереди может быть не больше
+        # workers + max_queue задач, остальные получают 503.
+        self.max_pending = self.workers + max_queue
+        self.stats = HashingStats()
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hasher",
+                )
+        return self._executor
+
+    async def _submit(self, operation: str, func, *args):
+        if self.stats.in_flight >= self.max_pending:
+            self.stats.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.stats.in_flight += 1
+        submitted = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            started, result = await loop.run_in_executor(
+                self._get_executor(), _run_timed, func, *args
+            )
+        finally:
+            self.stats.in_flight -= 1
+        self.stats.observe(
+            operation,
+            queue_wait=max(started - submitted, 0.0),
+            latency=time.monotonic() - submitted,
+        )
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", _hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(
+            "verify", _verify, plain_password, hashed_password
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+@lru_cache
+def get_password_hasher() -> PasswordHasher:
+    return PasswordHasher(
+        executor_type=settings.PASSWORD_HASH_EXECUTOR,
+        workers=settings.PASSWORD_HASH_WORKERS,
+        max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    )
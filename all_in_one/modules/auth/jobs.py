@@ -0,0 +1,91 @@
+# Фоновые задачи модуля auth, их выполняет воркер modules/jobs.
+
+
+import logging
+from datetime import datetime
+
+from ...core.config import settings
+from ...core.db import async_session
+from ...core.storage import get_storage
+from ..jobs.registry import JobContext, job
+from .repositories import (
+    delete_disabled_user,
+    delete_likes_on_user_media_chunk,
+    delete_user_likes_chunk,
+    delete_user_media_chunk,
+    is_user_disabled,
+    purge_expired_registration_tokens,
+)
+from .revocation import purge_revoked_tokens
+
+
+@job(
+    "auth.purge_revoked_tokens",
+    every=lambda: settings.REVOKED_TOKENS_PURGE_INTERVAL_SECONDS,
+)
+async def purge_revoked_tokens_job(context: JobContext) -> None:
+    async with async_session() as db:
+        deleted = await purge_revoked_tokens(db)
+    if deleted:
+        logging.info(f"Удалено просроченных отозванных токенов: {deleted}")
+
+
+@job(
+    "auth.purge_registration_tokens",
+    every=lambda: settings.REGISTRATION_TOKENS_PURGE_INTERVAL_SECONDS,
+)
+async def purge_registration_tokens_job(context: JobContext) -> None:
+    async with async_session() as db:
+        deleted = await purge_expired_registration_tokens(
+            db, datetime.utcnow(), settings.PURGE_CHUNK_SIZE
+        )
+    if deleted:
+        logging.info(f"Удалено просроченных токенов регистрации: {deleted}")
+
+
+@job("auth.delete_account")
+async def delete_account_job(context: JobContext, user_id: int) -> None:
+    # Аккаунт уже отключен в запросе на удаление. Здесь данные удаляются
+    # пачками: лайки пользователя, лайки на его медиа, медиа с файлами и в
+    # конце сам пользователь. Прогресс пишется после каждой пачки.
+    chunk_size = settings.PURGE_CHUNK_SIZE
+    storage = get_storage()
+    progress = {
+        "stage": "likes",
+        "likes_deleted": 0,
+        "media_likes_deleted": 0,
+        "media_deleted": 0,
+    }
+    async with async_session() as db:
+        if not await is_user_disabled(db, user_id):
+            logging.warning(f"Аккаунт {user_id} не найден или не отключен")
+            return
+        while deleted := await delete_user_likes_chunk(
+            db, user_id, chunk_size
+        ):
+            progress["likes_deleted"] += deleted
+            await context.set_progress(progress)
+
+        progress["stage"] = "media_likes"
+        while deleted := await delete_likes_on_user_media_chunk(
+            db, user_id, chunk_size
+        ):
+            progress["media_likes_deleted"] += deleted
+            await context.set_progress(progress)
+
+        progress["stage"] = "media"
+        while storage_keys := await delete_user_media_chunk(
+            db, user_id, chunk_size
+        ):
+            # Файлы удаляем после коммита: при сбое останется лишний файл,
+            # а не запись о медиа без файла.
+            for storage_key in storage_keys:
+                if storage_key is not None:
+                    await storage.delete(storage_key)
+            progress["media_deleted"] += len(storage_keys)
+            await context.set_progress(progress)
+
+        await delete_disabled_user(db, user_id)
+    progress["stage"] = "done"
+    await context.set_progress(progress)
+    logging.info(f"Удален аккаунт {user_id}: {progress}")
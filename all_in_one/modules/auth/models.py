@@ -4,7 +4,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Integer, LargeBinary, String
 from sqlalchemy.dialects.postgresql import UUID as SA_UUID
 from sqlalchemy.orm import relationship
 
@@ -23,8 +23,20 @@ class User(Base):
     )
     disabled = Column(Boolean, default=False)
     hashed_password = Column(String(255), nullable=False)
-    media = relationship("Media", back_populates="user")
-    likes = relationship("Likes", back_populates="user")
+    # Медиа и лайки удаляются пачками фоновой задачей auth.delete_account,
+    # поэтому ORM не должен загружать их при удалении пользователя.
+    media = relationship(
+        "Media",
+        back_populates="user",
+        lazy="raise_on_sql",
+        passive_deletes=True,
+    )
+    likes = relationship(
+        "Likes",
+        back_populates="user",
+        lazy="raise_on_sql",
+        passive_deletes=True,
+    )
 
 
 class TokenForRegistrationTelegram(Base):
@@ -35,10 +47,14 @@ class TokenForRegistrationTelegram(Base):
         SA_UUID(as_uuid=True), default=uuid.uuid4, unique=True
     )
     created_on = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
 
 
 class RevokedToken(Base):
     __tablename__ = "revoked_tokens"
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, nullable=False)
-    revoked_at = Column(DateTime, default=datetime.utcnow)
+    # sha256 от токена вместо самого JWT: фиксированные 32 байта в индексе.
+    token_digest = Column(LargeBinary(32), unique=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    # Ставится по часам БД, по нему воркеры подтягивают чужие отзывы.
+    revoked_at = Column(DateTime, default=datetime.utcnow, index=True)
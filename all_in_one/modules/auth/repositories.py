@@ -1 +1,213 @@
-# Тут мы прописываем запросы к БД, а затем просто будем их импортировать в представления.
\ No newline at end of file
+# Тут мы прописываем запросы к БД, а затем просто будем их импортировать в представления.
+
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.db import db_utcnow, delete_in_chunks
+from ..content.models import Media
+from ..likes.models import Likes
+from .models import RevokedToken, TokenForRegistrationTelegram, User
+
+
+async def get_revoked_tokens_since(
+    db: AsyncSession, since: datetime | None, now: datetime
+) -> list[tuple[bytes, datetime]]:
+    # since=None - все действующие отзывы.
+    query = select(RevokedToken.token_digest, RevokedToken.expires_at).where(
+        RevokedToken.expires_at > now
+    )
+    if since is not None:
+        query = query.where(RevokedToken.revoked_at >= since)
+    result = await db.execute(query)
+    return [(row.token_digest, row.expires_at) for row in result]
+
+
+async def add_revoked_token(
+    db: AsyncSession, token_digest: bytes, expires_at: datetime
+) -> None:
+    await db.execute(
+        insert(RevokedToken)
+        .values(
+            token_digest=token_digest,
+            expires_at=expires_at,
+            revoked_at=db_utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=[RevokedToken.token_digest])
+    )
+    await db.commit()
+
+
+async def purge_expired_revoked_tokens(
+    db: AsyncSession, now: datetime, chunk_size: int
+) -> int:
+    return await delete_in_chunks(
+        db, RevokedToken, RevokedToken.expires_at <= now, chunk_size
+    )
+
+
+async def issue_registration_token(
+    db: AsyncSession, chat_id: str, now: datetime, expires_at: datetime
+) -> tuple[uuid.UUID, bool]:
+    # Один запрос вместо INSERT, отката и повторного SELECT: действующий
+    # токен чата остается прежним, просроченный заменяется новым.
+    # Второе значение показывает, выдан ли токен только что.
+    table = TokenForRegistrationTelegram
+    stmt = insert(table).values(
+        chat_id=chat_id,
+        registration_token=uuid.uuid4(),
+        created_on=now,
+        expires_at=expires_at,
+    )
+    expired = table.expires_at <= now
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.chat_id],
+        set_={
+            "registration_token": case(
+                (expired, stmt.excluded.registration_token),
+                else_=table.registration_token,
+            ),
+            "created_on": case(
+                (expired, stmt.excluded.created_on), else_=table.created_on
+            ),
+            "expires_at": case(
+                (expired, stmt.excluded.expires_at), else_=table.expires_at
+            ),
+        },
+    ).returning(table.registration_token, table.expires_at)
+    row = (await db.execute(stmt)).one()
+    await db.commit()
+    return row.registration_token, row.expires_at == expires_at
+
+
+async def consume_registration_token(
+    db: AsyncSession, registration_token: str, now: datetime
+) -> bool:
+    # Удаляет токен в транзакции регистрации: при одновременных запросах
+    # с одним токеном пользователя создаст только один из них.
+    result = await db.execute(
+        delete(TokenForRegistrationTelegram)
+        .where(
+            TokenForRegistrationTelegram.registration_token
+            == registration_token,
+            TokenForRegistrationTelegram.expires_at > now,
+        )
+        .returning(TokenForRegistrationTelegram.id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def purge_expired_registration_tokens(
+    db: AsyncSession, now: datetime, chunk_size: int
+) -> int:
+    return await delete_in_chunks(
+        db,
+        TokenForRegistrationTelegram,
+        TokenForRegistrationTelegram.expires_at <= now,
+        chunk_size,
+    )
+
+
+# Удаление аккаунта. Каждая функция удаляет одну пачку не больше
+# chunk_size строк в своей короткой транзакции и возвращает, сколько
+# удалено: блокировки на likes и media держатся недолго, а повторный
+# запуск после сбоя продолжает с того места, где остановились.
+
+
+async def is_user_disabled(db: AsyncSession, user_id: int) -> bool:
+    result = await db.execute(select(User.disabled).where(User.id == user_id))
+    return bool(result.scalar_one_or_none())
+
+
+async def delete_user_likes_chunk(
+    db: AsyncSession, user_id: int, chunk_size: int
+) -> int:
+    # Лайки пользователя удаляются вместе с уменьшением like_count у
+    # медиа в том же запросе.
+    chunk = select(Likes.id).where(Likes.user_id == user_id).limit(chunk_size)
+    deleted = (
+        delete(Likes)
+        .where(Likes.id.in_(chunk.scalar_subquery()))
+        .returning(Likes.media_id)
+        .cte("deleted")
+    )
+    counts = (
+        select(deleted.c.media_id, func.count().label("likes"))
+        .group_by(deleted.c.media_id)
+        .cte("counts")
+    )
+    decremented = (
+        update(Media)
+        .where(Media.id == counts.c.media_id)
+        .values(like_count=func.greatest(Media.like_count - counts.c.likes, 0))
+        .returning(Media.id)
+        .cte("decremented")
+    )
+    result = await db.execute(
+        select(func.coalesce(func.sum(counts.c.likes), 0)).add_cte(decremented)
+    )
+    # sum в Postgres возвращает numeric.
+    count = int(result.scalar_one())
+    await db.commit()
+    return count
+
+
+async def delete_likes_on_user_media_chunk(
+    db: AsyncSession, user_id: int, chunk_size: int
+) -> int:
+    # Чужие лайки на медиа пользователя: счетчики не нужны, медиа удаляется
+    # следом.
+    user_media = select(Media.id).where(Media.user_id == user_id)
+    chunk = (
+        select(Likes.id)
+        .where(Likes.media_id.in_(user_media.scalar_subquery()))
+        .limit(chunk_size)
+    )
+    result = await db.execute(
+        delete(Likes).where(Likes.id.in_(chunk.scalar_subquery()))
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def delete_user_media_chunk(
+    db: AsyncSession, user_id: int, chunk_size: int
+) -> list[str | None]:
+    # Возвращает storage_key удаленных медиа, чтобы удалить их файлы.
+    # Строки медиа блокируются FOR UPDATE: новый лайк на них ждет коммита и
+    # потом падает на внешнем ключе. Лайки, появившиеся после этапа
+    # media_likes, удаляются здесь же, в той же транзакции.
+    result = await db.execute(
+        select(Media.id)
+        .where(Media.user_id == user_id)
+        .limit(chunk_size)
+        .with_for_update()
+    )
+    media_ids = list(result.scalars())
+    if not media_ids:
+        await db.commit()
+        return []
+    await db.execute(delete(Likes).where(Likes.media_id.in_(media_ids)))
+    result = await db.execute(
+        delete(Media)
+        .where(Media.id.in_(media_ids))
+        .returning(Media.storage_key)
+    )
+    storage_keys = list(result.scalars())
+    await db.commit()
+    return storage_keys
+
+
+async def delete_disabled_user(db: AsyncSession, user_id: int) -> bool:
+    result = await db.execute(
+        delete(User)
+        .where(User.id == user_id, User.disabled.is_(True))
+        .returning(User.id)
+    )
+    deleted = result.scalar_one_or_none() is not None
+    await db.commit()
+    return deleted
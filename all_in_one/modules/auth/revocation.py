@@ -0,0 +1,120 @@
+# Кеш отозванных токенов. Проверка токена на каждом запросе идет только по
+# памяти процесса, БД трогаем лишь при старте, при logout и в фоновой
+# синхронизации, которая подтягивает отзывы, сделанные другими воркерами.
+# И в БД, и в памяти хранится sha256 токена, а не сам JWT.
+
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.db import ChangeWindow
+from .repositories import (
+    add_revoked_token,
+    get_revoked_tokens_since,
+    purge_expired_revoked_tokens,
+)
+
+EXPIRATION_CLAIMS = ("exp", "exp_access", "exp_refresh")
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def token_expires_at(payload: dict) -> float:
+    expirations = [
+        payload[claim] for claim in EXPIRATION_CLAIMS if claim in payload
+    ]
+    if expirations:
+        return float(max(expirations))
+    return time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def _unverified_expires_at(token: str) -> float:
+    try:
+        payload = jwt.decode(token, options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        payload = {}
+    return token_expires_at(payload)
+
+
+# В таблице время хранится в UTC без таймзоны, как и во всех моделях.
+def _to_utc_naive(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def _to_timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevocationCache:
+    def __init__(self) -> None:
+        # digest -> момент истечения токена. После этого момента токен
+        # отклоняется и без кеша, поэтому запись можно забыть.
+        self._revoked: dict[bytes, float] = {}
+        # Первая синхронизация загружает все действующие отзывы, следующие -
+        # только недавние, с перекрытием.
+        self._window = ChangeWindow(settings.SYNC_OVERLAP_SECONDS)
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def _remember(self, digest: bytes, expires_at: float) -> None:
+        if expires_at > time.time():
+            self._revoked[digest] = expires_at
+
+    def is_revoked(self, token: str) -> bool:
+        digest = token_digest(token)
+        expires_at = self._revoked.get(digest)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            self._revoked.pop(digest, None)
+            return False
+        return True
+
+    async def sync(self, db: AsyncSession) -> None:
+        started = await self._window.start(db)
+        for digest, expires_at in await get_revoked_tokens_since(
+            db, self._window.since, _to_utc_naive(time.time())
+        ):
+            self._remember(digest, _to_timestamp(expires_at))
+        self._window.advance(started)
+        self.prune()
+
+    async def revoke(self, token: str, db: AsyncSession) -> None:
+        if self.is_revoked(token):
+            return
+        digest = token_digest(token)
+        expires_at = _unverified_expires_at(token)
+        await add_revoked_token(db, digest, _to_utc_naive(expires_at))
+        self._remember(digest, expires_at)
+
+    def prune(self) -> None:
+        now = time.time()
+        expired = [
+            digest
+            for digest, expires_at in self._revoked.items()
+            if expires_at <= now
+        ]
+        for digest in expired:
+            del self._revoked[digest]
+
+
+async def purge_revoked_tokens(db: AsyncSession) -> int:
+    return await purge_expired_revoked_tokens(
+        db, _to_utc_naive(time.time()), settings.PURGE_CHUNK_SIZE
+    )
+
+
+# Кеш создается при первом обращении, а не при импорте: конструктор читает
+# настройки.
+@lru_cache
+def get_revocation_cache() -> RevocationCache:
+    return RevocationCache()
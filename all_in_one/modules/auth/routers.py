@@ -1,9 +1,17 @@
 # Эндпоинты. Тут указывается путь для получения данных из БД. Т.е. мы указываем маршруты, по которым фронт будет получать нужные данные.
 
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from datetime import datetime
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
@@ -19,13 +27,18 @@ from all_in_one.modules.auth.dependencies import (
     get_current_active_user,
     get_password_hash,
     get_user,
-    is_token_revoked,
+    invalidate_user,
+    publish_user_changed,
+    revoke_token,
     verify_password,
     verify_refresh_token,
 )
-from all_in_one.modules.auth.models import TokenForRegistrationTelegram, User
+from all_in_one.modules.auth.models import User
 
-from ...core.dependencies import get_db
+from ...core.conditional import Validators, make_etag
+from ...core.config import settings
+from ...core.dependencies import get_db, get_read_db
+from ...core.responses import PydanticJSONResponse
 from ..auth.schemas import (
     CheckStatus,
     Login,
@@ -35,6 +48,8 @@ from ..auth.schemas import (
     UserRegistration,
     UserWithoutPassword,
 )
+from ..jobs.repositories import enqueue_job
+from .repositories import consume_registration_token
 
 router = APIRouter()
 
@@ -46,7 +61,7 @@ router = APIRouter()
     description="По запросу с фронта получаем refresh token, проверяем его на действительность, если надо обновляем и возвращаем новый refresh и access токены, если refresh еще действителен, возвращаем его и дополнительно обновленный access токен, также будет возвращена вся информация по пользователю. Этот запрос нужен для обновления в реальном времени токенов пользователя. Refresh возвращаем в cookies.",
     response_model=UserOutputInfo,
 )
-async def refresh_token(request: Request, db=Depends(get_db)):
+async def refresh_token(request: Request, db=Depends(get_read_db)):
     refresh_token = request.cookies.get("refresh_token")
     if not refresh_token:
         raise HTTPException(status_code=400, detail="Refresh token is missing")
@@ -69,20 +84,19 @@ async def refresh_token(request: Request, db=Depends(get_db)):
         )
 
     user_info = await get_user(username=username, db=db)
-    user_data = jsonable_encoder(UserWithoutPassword.model_validate(user_info))
-
-    response = JSONResponse(
-        content={
-            "success": "Token refreshed",
-            "access_token": new_access_token,
-            "user_data": user_data,
-        }
+
+    response = PydanticJSONResponse(
+        UserOutputInfo(
+            success="Token refreshed",
+            access_token=new_access_token,
+            user_data=UserWithoutPassword.model_validate(user_info),
+        )
     )
     response.set_cookie(
         key="refresh_token",
         value=new_refresh_token,
         httponly=True,
-        secure=True,
+        secure=settings.COOKIE_SECURE,
         samesite="strict",
     )
 
@@ -98,7 +112,7 @@ async def refresh_token(request: Request, db=Depends(get_db)):
 )
 async def get_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db)
-) -> Token:
+):
     user = await authenticate_user(
         db=db, username=form_data.username, password=form_data.password
     )
@@ -108,7 +122,9 @@ async def get_access_token(
         )
     access_token = create_access_token(data={"sub": user.username})
 
-    return Token(access_token=access_token, token_type="bearer")
+    return PydanticJSONResponse(
+        Token(access_token=access_token, token_type="bearer")
+    )
 
 
 @router.post(
@@ -123,28 +139,29 @@ async def registration(
     registration_token: str = Query(..., description="Registration token"),
     db=Depends(get_db),
 ):
-    hash_password = get_password_hash(user_data.password)
-
-    if check_registration_token(registration_token, db):
-        new_user = User(
-            username=user_data.username,
-            email=user_data.email,
-            hashed_password=hash_password,
-            full_name=user_data.full_name,
-        )
-        db.add(new_user)
+    # Сначала проверяем токен, чтобы не тратить пул хеширования на
+    # заведомо невалидные запросы.
+    await check_registration_token(registration_token, db)
+    hash_password = await get_password_hash(user_data.password)
+
+    new_user = User(
+        username=user_data.username,
+        email=user_data.email,
+        hashed_password=hash_password,
+        full_name=user_data.full_name,
+    )
+    db.add(new_user)
     try:
-        await db.commit()
-        await db.refresh(new_user)
-        await (
-            db.query(TokenForRegistrationTelegram)
-            .filter(
-                TokenForRegistrationTelegram.registration_token
-                == registration_token
+        # Пользователь и удаление токена фиксируются одной транзакцией.
+        if not await consume_registration_token(
+            db, registration_token, datetime.utcnow()
+        ):
+            await db.rollback()
+            raise HTTPException(
+                status_code=400, detail="Invalid registration token"
             )
-            .delete()
-        )
         await db.commit()
+        await db.refresh(new_user)
 
     except IntegrityError as err:
         await db.rollback()
@@ -152,10 +169,12 @@ async def registration(
             status_code=400, detail="Username or email already exists"
         ) from err
 
-    return UserOutputInfo(
-        success="Registration successful",
-        access_token=create_access_token(data={"sub": user_data.username}),
-        user_data=UserWithoutPassword.from_orm(new_user),
+    return PydanticJSONResponse(
+        UserOutputInfo(
+            success="Registration successful",
+            access_token=create_access_token(data={"sub": user_data.username}),
+            user_data=UserWithoutPassword.model_validate(new_user),
+        )
     )
 
 
@@ -172,7 +191,7 @@ async def refresh_profile(
     db: AsyncSession = Depends(get_db),
 ):
     if refresh_field is None:
-        return UserWithoutPassword.from_orm(user)
+        return PydanticJSONResponse(UserWithoutPassword.model_validate(user))
 
     if refresh_field.email:
         existing_user = await db.execute(
@@ -186,23 +205,28 @@ async def refresh_profile(
         user.full_name = refresh_field.full_name
 
     if refresh_field.hashed_password:
-        if verify_password(
+        if await verify_password(
             refresh_field.hashed_password, user.hashed_password
         ):
             raise HTTPException(
                 status_code=400,
                 detail="New password must be different from the old one",
             )
+        user.hashed_password = await get_password_hash(
+            refresh_field.hashed_password
+        )
 
-    user.hashed_password = get_password_hash(refresh_field.hashed_password)
-
+    username = user.username
     try:
+        await publish_user_changed(db, username)
         await db.commit()
     except IntegrityError as err:
         await db.rollback()
         raise HTTPException(status_code=400, detail="Uncorrect data") from err
+    finally:
+        invalidate_user(username)
 
-    return UserWithoutPassword.from_orm(user)
+    return PydanticJSONResponse(UserWithoutPassword.model_validate(user))
 
 
 @router.post(
@@ -217,25 +241,24 @@ async def login(user: Login = Body(...), db: AsyncSession = Depends(get_db)):
         db=db, username=user.username, password=user.password
     )
     user_info = await get_user(username=user.username, db=db)
-    user_data = jsonable_encoder(UserWithoutPassword.model_validate(user_info))
 
     code_token = create_dict_for_token_user(username=user.username)
 
     new_refresh_token = create_refresh_token(data=code_token)
     new_access_token = create_access_token(data=code_token)
 
-    response = JSONResponse(
-        content={
-            "success": "Login successful",
-            "access_token": new_access_token,
-            "user_data": user_data,
-        }
+    response = PydanticJSONResponse(
+        UserOutputInfo(
+            success="Login successful",
+            access_token=new_access_token,
+            user_data=UserWithoutPassword.model_validate(user_info),
+        )
     )
     response.set_cookie(
         key="refresh_token",
         value=new_refresh_token,
         httponly=True,
-        secure=True,
+        secure=settings.COOKIE_SECURE,
         samesite="strict",
     )
     return response
@@ -257,11 +280,14 @@ async def logout(
 
     if token:
         token_without_bearer = token.replace("Bearer ", "")
-        await is_token_revoked(token=token_without_bearer, db=db)
+        await revoke_token(token=token_without_bearer, db=db)
 
-    response = JSONResponse(content={"success": "Logout successful"})
+    response = PydanticJSONResponse(content={"success": "Logout successful"})
     response.delete_cookie(
-        key="refresh_token", httponly=True, secure=True, samesite="strict"
+        key="refresh_token",
+        httponly=True,
+        secure=settings.COOKIE_SECURE,
+        samesite="strict",
     )
     return response
 
@@ -270,22 +296,48 @@ async def logout(
     "/api/profile/",
     tags=["OAuth2"],
     name="Профиль пользователя",
-    description="Получение информации из профиля пользователя",
+    description="Получение информации из профиля пользователя. В ответе есть заголовки ETag и Last-Modified: если передать их в If-None-Match или If-Modified-Since и профиль не менялся, вернется 304 без тела.",
     response_model=UserWithoutPassword,
 )
-async def get_profile(user: User = Depends(get_current_active_user)):
-    return UserWithoutPassword.from_orm(user)
+async def get_profile(
+    request: Request, user: User = Depends(get_current_active_user)
+):
+    validators = Validators(
+        make_etag("user", user.id, user.updated_on), user.updated_on
+    )
+    return validators.response(
+        request,
+        lambda: PydanticJSONResponse(UserWithoutPassword.model_validate(user)),
+    )
 
 
 @router.delete(
     "/api/delete-account/",
     tags=["OAuth2"],
     name="Удаление аккаунта пользователя",
+    description="Аккаунт сразу отключается, а его лайки, медиа и сам пользователь удаляются в фоне небольшими порциями. Ход удаления виден по job_id.",
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def delete_account(
     user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ):
-    await db.delete(user)
-    await db.commit()
-    return {"message": "Account deleted successfully"}
+    username = user.username
+    user.disabled = True
+    # Отключение и задача на удаление попадают в базу одной транзакцией.
+    job_id = await enqueue_job(
+        db,
+        "auth.delete_account",
+        {"user_id": user.id},
+        dedup_key=f"auth.delete_account:{user.id}",
+        commit=False,
+    )
+    await publish_user_changed(db, username)
+    try:
+        await db.commit()
+    finally:
+        invalidate_user(username)
+    return PydanticJSONResponse(
+        {"message": "Account deletion scheduled", "job_id": job_id},
+        status_code=status.HTTP_202_ACCEPTED,
+    )
@@ -0,0 +1,109 @@
+# Массовая загрузка данных из NDJSON или CSV:
+#     python -m all_in_one.modules.bulk_import users users.ndjson
+#     python -m all_in_one.modules.bulk_import media media.csv
+#     python -m all_in_one.modules.bulk_import likes likes.ndjson \
+#         --defer-indexes --batch-size 100000
+#
+# Поля строк:
+#     users: username, email, hashed_password, [full_name, created_on,
+#            updated_on, disabled]
+#     media: id, title, category, photo_video_url, user_id или username,
+#            [created_at, updated_on]
+#     likes: media_id, user_id или username, [created_at]
+# Путь "-" читает стандартный ввод. Итог печатается в JSON.
+
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+import asyncpg
+
+from ...core.config import settings
+from .importer import (
+    LOADERS,
+    READERS,
+    ImportContext,
+    connection_dsn,
+    drop_deferrable_indexes,
+    fix_sequence,
+    import_rows,
+    load_user_ids,
+    recount_likes,
+    restore_indexes,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("table", choices=sorted(LOADERS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(READERS), default=None)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="удалить неуникальные индексы на время загрузки",
+    )
+    parser.add_argument(
+        "--skip-conflicts",
+        action="store_true",
+        help="пропускать строки, которые уже есть в таблице",
+    )
+    parser.add_argument(
+        "--no-reconcile",
+        action="store_true",
+        help="не пересчитывать like_count после загрузки лайков",
+    )
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> dict:
+    loader = LOADERS[args.table]
+    data_format = args.format or (
+        "csv" if args.path.endswith(".csv") else "ndjson"
+    )
+    file = (
+        sys.stdin
+        if args.path == "-"
+        else open(args.path, encoding="utf-8", newline="")
+    )
+    connection = await asyncpg.connect(connection_dsn())
+    try:
+        user_ids = None
+        if args.table != "users":
+            user_ids = await load_user_ids(connection)
+            logging.info(f"Загружено соответствий username: {len(user_ids)}")
+        indexes = []
+        if args.defer_indexes:
+            indexes = await drop_deferrable_indexes(connection, loader.table)
+        try:
+            stats = await import_rows(
+                connection,
+                loader,
+                READERS[data_format](file),
+                args.batch_size,
+                args.skip_conflicts,
+                ImportContext(user_ids),
+            )
+        finally:
+            await restore_indexes(connection, indexes)
+        if args.table == "media":
+            await fix_sequence(connection, loader.table)
+        if args.table == "likes" and not args.no_reconcile:
+            stats["like_counts_fixed"] = await recount_likes(
+                connection, settings.LIKE_COUNTER_RECONCILE_CHUNK_SIZE
+            )
+    finally:
+        await connection.close()
+        if file is not sys.stdin:
+            file.close()
+    return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    arguments = parse_args()
+    print(json.dumps(asyncio.run(main(arguments)), ensure_ascii=False))
@@ -0,0 +1,323 @@
+# Массовая загрузка users, media и likes через бинарный COPY asyncpg.
+# Вход читается построчно и уходит в базу пачками по batch_size строк,
+# поэтому память не зависит от размера файла. Каждая пачка - своя
+# транзакция: при ошибке уже загруженные пачки остаются в базе.
+#
+# Поле username в media и likes заменяется на user_id по словарю
+# username -> id, который один раз читается из users целиком.
+
+
+import csv
+import itertools
+import json
+import logging
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, TextIO
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from ...core.config import settings
+from ..content.utils import CategoryEnum
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_ndjson(file: TextIO) -> Iterator[dict]:
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(file: TextIO) -> Iterator[dict]:
+    # Пустые ячейки CSV считаем отсутствующими значениями.
+    for row in csv.DictReader(file):
+        yield {key: value for key, value in row.items() if value != ""}
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+def batched(rows: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _timestamp(value, default: datetime) -> datetime:
+    if value is None:
+        return default
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "t", "yes")
+
+
+def _category(value) -> str:
+    # SQLAlchemy хранит в enum-типе Postgres имена членов, а не значения.
+    try:
+        return CategoryEnum(value).name
+    except ValueError:
+        return CategoryEnum[str(value).upper()].name
+
+
+class TableLoader:
+    # Описание загрузки одной таблицы: колонки COPY и преобразование строки
+    # входа в кортеж значений этих колонок.
+
+    def __init__(
+        self,
+        table: str,
+        columns: tuple[str, ...],
+        convert: Callable[[dict, "ImportContext"], tuple],
+    ) -> None:
+        self.table = table
+        self.columns = columns
+        self.convert = convert
+
+
+class ImportContext:
+    def __init__(self, user_ids: dict[str, int] | None) -> None:
+        self.user_ids = user_ids
+        self.now = datetime.utcnow()
+
+    def user_id(self, row: dict) -> int:
+        if "user_id" in row:
+            return int(row["user_id"])
+        try:
+            return self.user_ids[row["username"]]
+        except KeyError as err:
+            raise RowError(f"Неизвестный пользователь {err}") from err
+
+
+def _user_row(row: dict, context: ImportContext) -> tuple:
+    created_on = _timestamp(row.get("created_on"), context.now)
+    return (
+        row["username"],
+        row["email"],
+        row.get("full_name"),
+        created_on,
+        _timestamp(row.get("updated_on"), created_on),
+        _bool(row.get("disabled", False)),
+        row["hashed_password"],
+    )
+
+
+def _media_row(row: dict, context: ImportContext) -> tuple:
+    created_at = _timestamp(row.get("created_at"), context.now)
+    return (
+        int(row["id"]),
+        row["title"],
+        _category(row["category"]),
+        row["photo_video_url"],
+        created_at,
+        _timestamp(row.get("updated_on"), created_at),
+        context.user_id(row),
+    )
+
+
+def _like_row(row: dict, context: ImportContext) -> tuple:
+    return (
+        context.user_id(row),
+        int(row["media_id"]),
+        _timestamp(row.get("created_at"), context.now),
+    )
+
+
+# id медиа берется из входа: на него ссылаются лайки того же набора данных.
+LOADERS = {
+    "users": TableLoader(
+        "users",
+        (
+            "username",
+            "email",
+            "full_name",
+            "created_on",
+            "updated_on",
+            "disabled",
+            "hashed_password",
+        ),
+        _user_row,
+    ),
+    "media": TableLoader(
+        "media",
+        (
+            "id",
+            "title",
+            "category",
+            "photo_video_url",
+            "created_at",
+            "updated_on",
+            "user_id",
+        ),
+        _media_row,
+    ),
+    "likes": TableLoader(
+        "likes", ("user_id", "media_id", "created_at"), _like_row
+    ),
+}
+
+# Индексы, которые можно отложить: не уникальные и не обслуживающие
+# ограничения. Первичные ключи и уникальные индексы остаются на месте.
+DEFERRABLE_INDEXES_QUERY = """
+SELECT i.relname AS name, pg_get_indexdef(i.oid) AS definition
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_class t ON t.oid = x.indrelid
+WHERE t.relname = $1
+  AND t.relnamespace = 'public'::regnamespace
+  AND NOT x.indisunique
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.oid)
+"""
+
+
+def connection_dsn() -> str:
+    url = make_url(settings.ASYNC_DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+async def load_user_ids(connection: asyncpg.Connection) -> dict[str, int]:
+    user_ids = {}
+    async with connection.transaction():
+        async for record in connection.cursor(
+            "SELECT username, id FROM users", prefetch=50_000
+        ):
+            user_ids[record["username"]] = record["id"]
+    return user_ids
+
+
+async def drop_deferrable_indexes(
+    connection: asyncpg.Connection, table: str
+) -> list[tuple[str, str]]:
+    indexes = [
+        (record["name"], record["definition"])
+        for record in await connection.fetch(DEFERRABLE_INDEXES_QUERY, table)
+    ]
+    for name, _ in indexes:
+        await connection.execute(f'DROP INDEX IF EXISTS "{name}"')
+    return indexes
+
+
+async def restore_indexes(
+    connection: asyncpg.Connection, indexes: list[tuple[str, str]]
+) -> None:
+    for name, definition in indexes:
+        logging.info(f"Восстанавливаем индекс {name}")
+        await connection.execute(definition)
+
+
+async def copy_batch(
+    connection: asyncpg.Connection,
+    loader: TableLoader,
+    records: list[tuple],
+    skip_conflicts: bool,
+) -> int:
+    async with connection.transaction():
+        if not skip_conflicts:
+            await connection.copy_records_to_table(
+                loader.table, records=records, columns=loader.columns
+            )
+            return len(records)
+        # Для повторной загрузки: COPY во временную таблицу, затем вставка
+        # с пропуском строк, нарушающих любое уникальное ограничение.
+        staging = f"import_{loader.table}"
+        columns = ", ".join(loader.columns)
+        await connection.execute(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {loader.table} WITH NO DATA"
+        )
+        await connection.copy_records_to_table(
+            staging, records=records, columns=loader.columns
+        )
+        status = await connection.execute(
+            f"INSERT INTO {loader.table} ({columns}) "
+            f"SELECT {columns} FROM {staging} "
+            "ON CONFLICT DO NOTHING"
+        )
+        return int(status.rsplit(" ", 1)[-1])
+
+
+async def fix_sequence(connection: asyncpg.Connection, table: str) -> None:
+    # После COPY с явными id последовательность отстает от данных.
+    await connection.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE((SELECT max(id) FROM {table}), 1))"
+    )
+
+
+async def import_rows(
+    connection: asyncpg.Connection,
+    loader: TableLoader,
+    rows: Iterable[dict],
+    batch_size: int,
+    skip_conflicts: bool,
+    context: ImportContext,
+) -> dict:
+    stats = {"read": 0, "inserted": 0, "skipped": 0, "batches": 0}
+    records = (
+        record
+        for record in (_convert(loader, row, context, stats) for row in rows)
+        if record is not None
+    )
+    for batch in batched(records, batch_size):
+        stats["inserted"] += await copy_batch(
+            connection, loader, batch, skip_conflicts
+        )
+        stats["batches"] += 1
+        logging.info(
+            f"{loader.table}: пачка {stats['batches']}, "
+            f"прочитано {stats['read']}, записано {stats['inserted']}"
+        )
+    return stats
+
+
+def _convert(
+    loader: TableLoader, row: dict, context: ImportContext, stats: dict
+) -> tuple | None:
+    stats["read"] += 1
+    try:
+        return loader.convert(row, context)
+    except (KeyError, ValueError) as err:
+        stats["skipped"] += 1
+        if stats["skipped"] <= 10:
+            logging.warning(f"Строка {stats['read']} пропущена: {err!r}")
+        return None
+
+
+async def recount_likes(
+    connection: asyncpg.Connection, chunk_size: int
+) -> int:
+    # Пересчет по диапазонам id медиа, каждый диапазон - отдельный запрос в
+    # своей транзакции: блокировки строк media держатся недолго, и одна
+    # огромная транзакция не раздувает таблицу. Медиа без лайков тоже
+    # попадают в пересчет и получают 0.
+    bounds = await connection.fetchrow("SELECT min(id), max(id) FROM media")
+    low, high = bounds[0], bounds[1]
+    if low is None:
+        return 0
+    fixed = 0
+    for start in range(low, high + 1, chunk_size):
+        status = await connection.execute(
+            """
+            UPDATE media m SET like_count = c.likes
+            FROM (
+                SELECT media.id, count(likes.media_id) AS likes
+                FROM media
+                LEFT JOIN likes ON likes.media_id = media.id
+                WHERE media.id >= $1 AND media.id < $2
+                GROUP BY media.id
+            ) c
+            WHERE m.id = c.id AND m.like_count <> c.likes
+            """,
+            start,
+            start + chunk_size,
+        )
+        fixed += int(status.rsplit(" ", 1)[-1])
+    return fixed
@@ -0,0 +1,120 @@
+import base64
+import binascii
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from ...core.conditional import make_etag
+from ..auth.models import User
+from .models import Media
+from .schemas import MediaAuthor, MediaOutput
+from .utils import CategoryEnum
+
+# Автор нужен в каждом элементе ленты: many-to-one грузим тем же запросом
+# через JOIN и только те колонки, что попадают в ответ.
+WITH_AUTHOR = joinedload(Media.user, innerjoin=True).load_only(
+    User.id, User.username
+)
+
+# Медиа отключенных пользователей не показываются нигде: аккаунт может
+# удаляться фоновой задачей еще долго после отключения. Отключенных мало,
+# поэтому NOT IN по ним не мешает keyset-пагинации по индексу.
+FROM_ACTIVE_AUTHOR = Media.user_id.not_in(
+    select(User.id).where(User.disabled.is_(True))
+)
+
+
+# Курсор - позиция последнего элемента страницы (created_at, id). Следующая
+# страница начинается строго после него, поэтому глубина прокрутки не влияет
+# на стоимость запроса, в отличие от OFFSET.
+def encode_cursor(created_at: datetime, media_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{media_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, media_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(media_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as err:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from err
+
+
+async def get_media_page(
+    db: AsyncSession,
+    limit: int,
+    cursor: str | None = None,
+    category: CategoryEnum | None = None,
+) -> tuple[list[Media], str | None]:
+    query = (
+        select(Media)
+        .options(WITH_AUTHOR)
+        .where(FROM_ACTIVE_AUTHOR)
+        .order_by(Media.created_at.desc(), Media.id.desc())
+        .limit(limit + 1)
+    )
+    if category is not None:
+        query = query.where(Media.category == category)
+    if cursor is not None:
+        query = query.where(
+            tuple_(Media.created_at, Media.id) < tuple_(*decode_cursor(cursor))
+        )
+
+    result = await db.execute(query)
+    items = list(result.scalars())
+    next_cursor = None
+    # Запросили на один элемент больше, чтобы понять, есть ли еще страница.
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return items, next_cursor
+
+
+async def get_media_by_ids(db: AsyncSession, ids: list[int]) -> list[Media]:
+    # Один запрос на всю страницу с сохранением порядка ids.
+    if not ids:
+        return []
+    result = await db.execute(
+        select(Media)
+        .options(WITH_AUTHOR)
+        .where(Media.id.in_(ids), FROM_ACTIVE_AUTHOR)
+    )
+    media_by_id = {media.id: media for media in result.scalars()}
+    return [
+        media_by_id[media_id] for media_id in ids if media_id in media_by_id
+    ]
+
+
+def media_outputs(items: list[Media], liked: set[int]) -> list[MediaOutput]:
+    # Медиа должны быть загружены с WITH_AUTHOR, liked - id медиа из
+    # страницы, которые лайкнул текущий пользователь (get_liked_media_ids).
+    # Вместе с запросом страницы это два запроса независимо от ее размера.
+    outputs = []
+    for item in items:
+        output = MediaOutput.model_validate(item)
+        output.author = MediaAuthor.model_validate(item.user)
+        output.liked_by_me = item.id in liked
+        outputs.append(output)
+    return outputs
+
+
+def media_page_etag(items: list[Media], liked: set[int], *extra) -> str:
+    # Версия страницы по уже загруженным строкам: все, что попадает в
+    # ответ и может измениться, без сборки схем и сериализации.
+    return make_etag(
+        *extra,
+        *(
+            (
+                item.id,
+                item.updated_on,
+                item.like_count,
+                item.user.username,
+                item.id in liked,
+            )
+            for item in items
+        ),
+    )
@@ -1,6 +1,15 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
 from sqlalchemy.orm import relationship
 
 from all_in_one.core.db import Base
@@ -13,10 +22,39 @@ class Media(Base):
     title = Column(String(100), nullable=False, index=True)
     category = Column(Enum(CategoryEnum), nullable=False)
     photo_video_url = Column(String(1024), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_on = Column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    user = relationship("User", back_populates="media")
-    likes = relationship("Likes", back_populates="media")
+    # Денормализованный счетчик лайков, обновляется пачками из
+    # modules/likes/counters.py.
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Заполняются только для файлов, загруженных через API.
+    storage_key = Column(String(64), nullable=True, unique=True)
+    content_type = Column(String(100), nullable=True)
+    content_size = Column(BigInteger, nullable=True)
+    content_sha256 = Column(String(64), nullable=True)
+    # Под AsyncSession ленивая загрузка не работает, поэтому связи грузятся
+    # только явно через опции запроса, а неявное обращение падает сразу.
+    user = relationship("User", back_populates="media", lazy="raise_on_sql")
+    likes = relationship(
+        "Likes",
+        back_populates="media",
+        lazy="raise_on_sql",
+        passive_deletes=True,
+    )
+
+    # Индексы под keyset-пагинацию ленты: порядок колонок совпадает с
+    # ORDER BY created_at DESC, id DESC.
+    __table_args__ = (
+        Index("ix_media_created_at_id", created_at.desc(), id.desc()),
+        Index(
+            "ix_media_category_created_at_id",
+            category,
+            created_at.desc(),
+            id.desc(),
+        ),
+        # Под синхронизацию поискового индекса по времени изменения.
+        Index("ix_media_updated_on_id", updated_on, id),
+    )
@@ -0,0 +1,231 @@
+import mimetypes
+import uuid
+
+import anyio
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.conditional import Validators
+from ...core.config import settings
+from ...core.dependencies import get_db, get_read_db
+from ...core.responses import PathSendFileResponse, PydanticJSONResponse
+from ...core.storage import (
+    KEY_PATTERN,
+    MeteredStream,
+    UploadTooLarge,
+    get_storage,
+)
+from ..auth.dependencies import get_current_active_user
+from ..auth.models import User
+from ..likes.dependencies import get_liked_media_ids
+from .dependencies import (
+    get_media_by_ids,
+    get_media_page,
+    media_outputs,
+    media_page_etag,
+)
+from .models import Media
+from .schemas import MediaOutput, MediaPage, ScoredMedia
+from .search import get_title_index
+from .trending import get_trending_index
+from .utils import CategoryEnum
+
+router = APIRouter()
+
+
+async def scored_media(
+    request: Request,
+    db: AsyncSession,
+    scores: list[tuple[int, float]],
+    user_id: int,
+) -> Response:
+    score_by_id = dict(scores)
+    media = await get_media_by_ids(db, [media_id for media_id, _ in scores])
+    liked = await get_liked_media_ids(db, user_id, [item.id for item in media])
+
+    def render() -> Response:
+        # Поля уже проверены при сборке MediaOutput, повторная валидация не
+        # нужна.
+        return PydanticJSONResponse(
+            [
+                ScoredMedia.model_construct(
+                    **dict(output), score=score_by_id[output.id]
+                )
+                for output in media_outputs(media, liked)
+            ]
+        )
+
+    validators = Validators(media_page_etag(media, liked, scores))
+    return validators.response(request, render)
+
+
+@router.get(
+    "/api/media/",
+    tags=["Media"],
+    name="Лента медиа",
+    description="Лента медиа от новых к старым с курсорной пагинацией. В ответе приходит next_cursor, его нужно передать в следующем запросе, чтобы получить следующую страницу. Можно отфильтровать ленту по категории.",
+    response_model=MediaPage,
+)
+async def media_feed(
+    request: Request,
+    category: CategoryEnum | None = Query(None, description="Категория"),
+    cursor: str | None = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    items, next_cursor = await get_media_page(
+        db, limit=limit, cursor=cursor, category=category
+    )
+    liked = await get_liked_media_ids(db, user.id, [item.id for item in items])
+    validators = Validators(media_page_etag(items, liked, next_cursor))
+    return validators.response(
+        request,
+        lambda: PydanticJSONResponse(
+            MediaPage(
+                items=media_outputs(items, liked), next_cursor=next_cursor
+            )
+        ),
+    )
+
+
+@router.get(
+    "/api/media/trending/",
+    tags=["Media"],
+    name="Популярные медиа в категории",
+    description="Топ медиа категории по количеству лайков, где свежие лайки весят больше старых. Рейтинг считается в памяти и обновляется по мере появления новых лайков.",
+    response_model=list[ScoredMedia],
+)
+async def trending_media(
+    request: Request,
+    category: CategoryEnum = Query(..., description="Категория"),
+    limit: int = Query(20, ge=1, le=100, description="Размер топа"),
+    user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await scored_media(
+        request, db, get_trending_index().top(category, limit), user.id
+    )
+
+
+@router.get(
+    "/api/media/search/",
+    tags=["Media"],
+    name="Поиск медиа по названию",
+    description="Нечеткий поиск по названиям медиа: находит совпадения с опечатками и перестановкой слов. Результаты отсортированы по степени совпадения от 0 до 100.",
+    response_model=list[ScoredMedia],
+)
+async def search_media(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Запрос"),
+    limit: int = Query(20, ge=1, le=100, description="Количество результатов"),
+    user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await scored_media(
+        request, db, get_title_index().search(q, limit), user.id
+    )
+
+
+@router.post(
+    "/api/media/upload/",
+    tags=["Media"],
+    name="Загрузка медиа",
+    description="Загрузка фото или видео. Файл передается в теле запроса как есть (не multipart), тип указывается в заголовке Content-Type. Файл пишется в хранилище потоком, по пути считается его размер и sha256. Если файл больше UPLOAD_MAX_BYTES, загрузка обрывается с ошибкой 413.",
+    response_model=MediaOutput,
+    status_code=status.HTTP_201_CREATED,
+)
+async def upload_media(
+    request: Request,
+    title: str = Query(
+        ..., min_length=1, max_length=100, description="Название"
+    ),
+    category: CategoryEnum = Query(..., description="Категория"),
+    content_type: str = Header(..., description="Тип файла"),
+    content_length: int | None = Header(None),
+    user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    content_type = content_type.split(";")[0].strip().lower()
+    if not content_type.startswith(("image/", "video/")):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Only images and videos can be uploaded",
+        )
+    # Отказываем сразу, если клиент заранее сообщил слишком большой размер.
+    if (
+        content_length is not None
+        and content_length > settings.UPLOAD_MAX_BYTES
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File is too large",
+        )
+
+    storage = get_storage()
+    extension = mimetypes.guess_extension(content_type) or ""
+    storage_key = f"{uuid.uuid4().hex}{extension}"
+    stream = MeteredStream(
+        request.stream(),
+        chunk_size=settings.UPLOAD_CHUNK_SIZE_BYTES,
+        max_size=settings.UPLOAD_MAX_BYTES,
+    )
+    try:
+        await storage.save(storage_key, stream.chunks())
+    except UploadTooLarge as err:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File is too large",
+        ) from err
+
+    media = Media(
+        title=title,
+        category=category,
+        photo_video_url=storage.url(storage_key),
+        user_id=user.id,
+        storage_key=storage_key,
+        content_type=content_type,
+        content_size=stream.size,
+        content_sha256=stream.sha256,
+    )
+    db.add(media)
+    try:
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await storage.delete(storage_key)
+        raise
+    return PydanticJSONResponse(
+        MediaOutput.model_validate(media), status_code=status.HTTP_201_CREATED
+    )
+
+
+@router.get(
+    "/api/media/files/{storage_key}",
+    tags=["Media"],
+    name="Файл медиа",
+    description="Отдает загруженный файл с диска. Поддерживаются запросы с заголовком Range, поэтому видео можно перематывать. Ключ файла неизменяемый, поэтому ответ можно долго кешировать.",
+    response_class=PathSendFileResponse,
+)
+async def media_file(storage_key: str):
+    if not KEY_PATTERN.match(storage_key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    path = get_storage().local_path(storage_key)
+    if path is None or not await anyio.Path(path).is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    # Range обрабатывает FileResponse, файл целиком на серверах с
+    # http.response.pathsend уходит через sendfile (см. PathSendFileResponse).
+    return PathSendFileResponse(
+        path,
+        media_type=mimetypes.guess_type(storage_key)[0],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from .utils import CategoryEnum
+
+
+class MediaAuthor(BaseModel):
+    id: int
+    username: str
+
+    class Config:
+        from_attributes = True
+
+
+class MediaOutput(BaseModel):
+    id: int
+    title: str
+    category: CategoryEnum
+    photo_video_url: str
+    created_at: datetime
+    updated_on: datetime
+    user_id: int
+    like_count: int = 0
+    content_type: str | None = None
+    content_size: int | None = None
+    content_sha256: str | None = None
+    # Заполняются в ленте, топе и поиске.
+    author: MediaAuthor | None = None
+    liked_by_me: bool | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class MediaPage(BaseModel):
+    items: list[MediaOutput]
+    next_cursor: str | None = None
+
+
+class ScoredMedia(MediaOutput):
+    score: float
@@ -0,0 +1,176 @@
+# Нечеткий поиск по названиям медиа. Инвертированный индекс по триграммам
+# быстро отбирает кандидатов, а rapidfuzz пакетно ранжирует только их, без
+# полного прохода по таблице через ILIKE.
+#
+# Изменения из других воркеров подтягиваются по updated_on с перекрытием
+# (core.db.ChangeWindow). Удаленные медиа остаются в индексе до пересборки,
+# но в ответ не попадают: найденные id перечитываются из БД. Строки, которые
+# пишутся в обход ORM со старым updated_on (bulk_import), тоже появятся
+# только после пересборки.
+
+
+import asyncio
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+from rapidfuzz import fuzz, process, utils
+from sqlalchemy import event, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.db import ChangeWindow
+from .models import Media
+
+NGRAM_SIZE = 3
+SYNC_BATCH_SIZE = 10000
+
+
+def title_ngrams(title: str) -> set[str]:
+    normalized = f"  {utils.default_process(title)} "
+    return {
+        normalized[i : i + NGRAM_SIZE]
+        for i in range(len(normalized) - NGRAM_SIZE + 1)
+    }
+
+
+class TitleSearchIndex:
+    def __init__(self, max_candidates: int) -> None:
+        self.max_candidates = max_candidates
+        self.titles: dict[int, str] = {}
+        # Списки id в компактных массивах. При изменении или удалении
+        # названия старые записи не вычищаются: лишний кандидат отсеется при
+        # ранжировании по актуальному названию, а мусор уберет пересборка.
+        self.postings: dict[str, array] = {}
+        self.rebuild_seconds = 0.0
+        self._window = ChangeWindow(settings.SYNC_OVERLAP_SECONDS)
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def add(self, media_id: int, title: str) -> None:
+        if self.titles.get(media_id) == title:
+            return
+        self.titles[media_id] = title
+        for gram in title_ngrams(title):
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array("i")
+            posting.append(media_id)
+
+    def remove(self, media_id: int) -> None:
+        self.titles.pop(media_id, None)
+
+    def _candidates(self, query: str) -> dict[int, str]:
+        postings = [
+            posting
+            for gram in title_ngrams(query)
+            if (posting := self.postings.get(gram))
+        ]
+        # Идем от редких триграмм к частым. Частые триграммы почти ничего не
+        # говорят о совпадении, поэтому, когда кандидатов уже с запасом,
+        # оставшиеся длинные списки пропускаем.
+        postings.sort(key=len)
+        overlap: Counter[int] = Counter()
+        for posting in postings:
+            if overlap and len(overlap) + len(posting) > (
+                self.max_candidates * 20
+            ):
+                break
+            overlap.update(posting)
+        candidates = {}
+        for media_id, _ in overlap.most_common(self.max_candidates):
+            title = self.titles.get(media_id)
+            if title is not None:
+                candidates[media_id] = title
+        return candidates
+
+    def search(
+        self, query: str, limit: int, score_cutoff: float = 50
+    ) -> list[tuple[int, float]]:
+        candidates = self._candidates(query)
+        if not candidates:
+            return []
+        matches = process.extract(
+            query,
+            candidates,
+            scorer=fuzz.WRatio,
+            processor=utils.default_process,
+            limit=limit,
+            score_cutoff=score_cutoff,
+        )
+        return [(media_id, score) for _, score, media_id in matches]
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        async with self._lock:
+            started = time.perf_counter()
+            window_started = await self._window.start(db)
+            fresh = TitleSearchIndex(self.max_candidates)
+            result = await db.stream(
+                select(Media.id, Media.title).execution_options(
+                    yield_per=SYNC_BATCH_SIZE
+                )
+            )
+            async for media_id, title in result:
+                fresh.add(media_id, title)
+            self.titles = fresh.titles
+            self.postings = fresh.postings
+            self._window.advance(window_started)
+            self.rebuild_seconds = time.perf_counter() - started
+
+    async def sync(self, db: AsyncSession) -> None:
+        # Медиа, добавленные или переименованные через другие воркеры.
+        # Изменения в этом процессе попадают в индекс сразу через события
+        # маппера. Повторно прочитанные строки add пропускает сам.
+        if self._window.since is None:
+            await self.rebuild(db)
+            return
+        async with self._lock:
+            started = await self._window.start(db)
+            query = (
+                select(Media.id, Media.title, Media.updated_on)
+                .where(Media.updated_on >= self._window.since)
+                .order_by(Media.updated_on, Media.id)
+            )
+            last = None
+            while True:
+                page = query
+                if last is not None:
+                    page = page.where(
+                        tuple_(Media.updated_on, Media.id) > tuple_(*last)
+                    )
+                rows = (await db.execute(page.limit(SYNC_BATCH_SIZE))).all()
+                for media_id, title, _ in rows:
+                    self.add(media_id, title)
+                if len(rows) < SYNC_BATCH_SIZE:
+                    break
+                last = (rows[-1].updated_on, rows[-1].id)
+            self._window.advance(started)
+
+    def stats(self) -> dict:
+        return {
+            "titles": len(self.titles),
+            "ngrams": len(self.postings),
+            "postings": sum(
+                len(posting) for posting in self.postings.values()
+            ),
+            "rebuild_seconds": self.rebuild_seconds,
+        }
+
+
+@lru_cache
+def get_title_index() -> TitleSearchIndex:
+    return TitleSearchIndex(max_candidates=settings.SEARCH_MAX_CANDIDATES)
+
+
+@event.listens_for(Media, "after_insert")
+@event.listens_for(Media, "after_update")
+def _index_media_title(mapper, connection, target: Media) -> None:
+    get_title_index().add(target.id, target.title)
+
+
+@event.listens_for(Media, "after_delete")
+def _unindex_media_title(mapper, connection, target: Media) -> None:
+    get_title_index().remove(target.id)
@@ -0,0 +1,255 @@
+# Рейтинг популярных медиа по категориям. Каждый лайк дает вклад
+# exp((t - landmark) / tau): чем свежее лайк, тем больше вклад. Вклад старых
+# лайков не приходится уменьшать со временем, порядок сохраняется сам, а
+# для ответа значения приводятся к текущему моменту. Рейтинг целиком живет
+# в памяти, обновляется новыми строками likes и периодически
+# пересобирается из БД. Новые лайки ищутся по created_at с перекрытием
+# (core.db.ChangeWindow), удаленные приходят событием like_removed.
+
+
+import asyncio
+import bisect
+import json
+import math
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.db import ChangeWindow
+from ..likes.models import Likes
+from .models import Media
+from .utils import CategoryEnum
+
+# Когда показатель экспоненты дорастает до этого значения, все веса
+# пересчитываются относительно новой точки отсчета, чтобы не было
+# переполнения float.
+REBASE_EXPONENT = 100.0
+SYNC_BATCH_SIZE = 10000
+
+
+class CategoryRanking:
+    def __init__(self) -> None:
+        self.scores: dict[int, float] = {}
+        # (-score, media_id) по возрастанию: начало списка - топ рейтинга.
+        self.order: list[tuple[float, int]] = []
+
+    def add(self, media_id: int, weight: float) -> None:
+        old = self.scores.get(media_id)
+        if old is not None:
+            del self.order[bisect.bisect_left(self.order, (-old, media_id))]
+        score = (old or 0.0) + weight
+        # После вычитания удаленных лайков остается ноль с погрешностью.
+        if score <= abs(weight) * 1e-9:
+            self.scores.pop(media_id, None)
+            return
+        self.scores[media_id] = score
+        bisect.insort(self.order, (-score, media_id))
+
+    def rebuild_order(self) -> None:
+        self.order = sorted(
+            (-score, media_id) for media_id, score in self.scores.items()
+        )
+
+    def scale(self, factor: float) -> None:
+        self.scores = {
+            media_id: score * factor for media_id, score in self.scores.items()
+        }
+        self.rebuild_order()
+
+    def top(self, limit: int) -> list[tuple[int, float]]:
+        return [(media_id, -score) for score, media_id in self.order[:limit]]
+
+    def memory_bytes(self) -> int:
+        entry = sys.getsizeof((0.0, 0)) + sys.getsizeof(0.0)
+        return (
+            sys.getsizeof(self.scores)
+            + sys.getsizeof(self.order)
+            + len(self.order) * entry
+        )
+
+
+def _empty_rankings() -> dict[CategoryEnum, CategoryRanking]:
+    return {category: CategoryRanking() for category in CategoryEnum}
+
+
+class TrendingIndex:
+    def __init__(self, half_life_hours: float, window_hours: float) -> None:
+        self.tau = half_life_hours * 3600 / math.log(2)
+        self.window = timedelta(hours=window_hours)
+        self.landmark = time.time()
+        self.rankings = _empty_rankings()
+        self.rebuild_seconds = 0.0
+        # Лайки старше этой отметки в последнюю пересборку не попали.
+        self.rebuilt_since: datetime | None = None
+        # id лайков из перекрытия окна синхронизации, уже учтенных или
+        # удаленных: при повторном чтении они пропускаются.
+        self.recent: dict[int, datetime] = {}
+        self._window = ChangeWindow(settings.SYNC_OVERLAP_SECONDS)
+        self._lock = asyncio.Lock()
+
+    def _weight(self, created_at: datetime, landmark: float) -> float:
+        # created_at хранится в UTC без таймзоны
+        timestamp = created_at.replace(tzinfo=timezone.utc).timestamp()
+        return math.exp((timestamp - landmark) / self.tau)
+
+    def _maybe_rebase(self) -> None:
+        shift = time.time() - self.landmark
+        if shift / self.tau < REBASE_EXPONENT:
+            return
+        factor = math.exp(-shift / self.tau)
+        for ranking in self.rankings.values():
+            ranking.scale(factor)
+        self.landmark += shift
+
+    def add_like(
+        self, media_id: int, category: CategoryEnum, created_at: datetime
+    ) -> None:
+        self._maybe_rebase()
+        self.rankings[category].add(
+            media_id, self._weight(created_at, self.landmark)
+        )
+
+    def remove_like(
+        self, like_id: int, media_id: int, created_at: datetime
+    ) -> None:
+        # Лайк учтен, если он пережил последнюю пересборку и уже прочитан
+        # синхронизацией: либо он в recent, либо старше границы окна.
+        applied = (
+            self.rebuilt_since is not None
+            and created_at >= self.rebuilt_since
+            and (
+                like_id in self.recent
+                or (
+                    self._window.since is not None
+                    and created_at < self._window.since
+                )
+            )
+        )
+        self.recent[like_id] = created_at
+        if not applied:
+            return
+        self._maybe_rebase()
+        for ranking in self.rankings.values():
+            if media_id in ranking.scores:
+                ranking.add(media_id, -self._weight(created_at, self.landmark))
+                return
+
+    def top(
+        self, category: CategoryEnum, limit: int
+    ) -> list[tuple[int, float]]:
+        # Приводим вес к текущему моменту: получается количество лайков,
+        # взвешенное по их свежести.
+        decay = math.exp((self.landmark - time.time()) / self.tau)
+        return [
+            (media_id, score * decay)
+            for media_id, score in self.rankings[category].top(limit)
+        ]
+
+    def _likes_query(self):
+        return (
+            select(Likes.id, Likes.media_id, Media.category, Likes.created_at)
+            .join(Media, Media.id == Likes.media_id)
+            .order_by(Likes.created_at, Likes.id)
+        )
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        async with self._lock:
+            started = time.perf_counter()
+            window_started = await self._window.start(db)
+            landmark = time.time()
+            since = window_started - self.window
+            overlap_since = window_started - timedelta(
+                seconds=self._window.overlap
+            )
+            rankings = _empty_rankings()
+            recent = {}
+            result = await db.stream(
+                self._likes_query()
+                .where(Likes.created_at >= since)
+                .execution_options(yield_per=SYNC_BATCH_SIZE)
+            )
+            # Сначала копим суммы в словарях и сортируем один раз в конце,
+            # а не вставляем каждый лайк в отсортированный список.
+            async for like_id, media_id, category, created_at in result:
+                scores = rankings[category].scores
+                scores[media_id] = scores.get(media_id, 0.0) + self._weight(
+                    created_at, landmark
+                )
+                if created_at >= overlap_since:
+                    recent[like_id] = created_at
+            for ranking in rankings.values():
+                ranking.rebuild_order()
+            self.rankings = rankings
+            self.landmark = landmark
+            self.rebuilt_since = since
+            self.recent = recent
+            self._window.advance(window_started)
+            self.rebuild_seconds = time.perf_counter() - started
+
+    async def sync(self, db: AsyncSession) -> None:
+        # Подтягиваем лайки, появившиеся после последней синхронизации, в том
+        # числе поставленные через другие воркеры. Окно читается с
+        # перекрытием, повторно прочитанные лайки отсеиваются по recent.
+        if self._window.since is None:
+            await self.rebuild(db)
+            return
+        async with self._lock:
+            started = await self._window.start(db)
+            query = self._likes_query().where(
+                Likes.created_at >= self._window.since
+            )
+            last = None
+            while True:
+                page = query
+                if last is not None:
+                    page = page.where(
+                        tuple_(Likes.created_at, Likes.id) > tuple_(*last)
+                    )
+                rows = (await db.execute(page.limit(SYNC_BATCH_SIZE))).all()
+                for like_id, media_id, category, created_at in rows:
+                    if like_id not in self.recent:
+                        self.add_like(media_id, category, created_at)
+                        self.recent[like_id] = created_at
+                if len(rows) < SYNC_BATCH_SIZE:
+                    break
+                last = (rows[-1].created_at, rows[-1].id)
+            self._window.advance(started)
+            self.recent = {
+                like_id: created_at
+                for like_id, created_at in self.recent.items()
+                if created_at >= self._window.since
+            }
+
+    def stats(self) -> dict:
+        return {
+            "entries": sum(
+                len(ranking.scores) for ranking in self.rankings.values()
+            ),
+            "memory_bytes": sum(
+                ranking.memory_bytes() for ranking in self.rankings.values()
+            ),
+            "rebuild_seconds": self.rebuild_seconds,
+            "recent_likes": len(self.recent),
+        }
+
+
+def handle_like_removed(payload: str) -> None:
+    data = json.loads(payload)
+    get_trending_index().remove_like(
+        data["id"],
+        data["media_id"],
+        datetime.fromisoformat(data["created_at"]),
+    )
+
+
+@lru_cache
+def get_trending_index() -> TrendingIndex:
+    return TrendingIndex(
+        half_life_hours=settings.TRENDING_HALF_LIFE_HOURS,
+        window_hours=settings.TRENDING_WINDOW_HOURS,
+    )
@@ -0,0 +1,78 @@
+# Выгрузка данных пользователя в NDJSON: строка профиля, затем медиа и
+# лайки, каждая строка вида {"type": ..., "data": {...}}. Строки читаются
+# курсором на сервере БД порциями по EXPORT_YIELD_PER и сразу уходят
+# клиенту, поэтому память не зависит от объема данных.
+
+
+from typing import AsyncIterator
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.db import async_session, replica_session
+from ..content.models import Media
+from ..likes.models import Likes
+
+
+def ndjson_line(kind: str, data: BaseModel | dict) -> bytes:
+    return to_json({"type": kind, "data": data}) + b"\n"
+
+
+# Выбираем колонки, а не объекты ORM: строки не попадают в identity map
+# сессии.
+def media_query(user_id: int) -> Select:
+    return (
+        select(
+            Media.id,
+            Media.title,
+            Media.category,
+            Media.photo_video_url,
+            Media.created_at,
+            Media.updated_on,
+            Media.like_count,
+            Media.content_type,
+            Media.content_size,
+            Media.content_sha256,
+        )
+        .where(Media.user_id == user_id)
+        .order_by(Media.id)
+    )
+
+
+def likes_query(user_id: int) -> Select:
+    return (
+        select(Likes.media_id, Likes.created_at)
+        .where(Likes.user_id == user_id)
+        .order_by(Likes.id)
+    )
+
+
+async def stream_lines(
+    db: AsyncSession, kind: str, query: Select
+) -> AsyncIterator[bytes]:
+    result = await db.stream(
+        query.execution_options(yield_per=settings.EXPORT_YIELD_PER)
+    )
+    async for rows in result.partitions():
+        yield b"".join(ndjson_line(kind, row._asdict()) for row in rows)
+
+
+async def export_lines(
+    profile: BaseModel, user_id: int, use_replica: bool
+) -> AsyncIterator[bytes]:
+    # Профиль уже загружен при проверке токена: клиент получает первую
+    # строку до запросов к БД. Сессия своя, а не из зависимости: она должна
+    # жить, пока ответ передается.
+    yield ndjson_line("profile", profile)
+    async with replica_session() if use_replica else async_session() as db:
+        # Медиа и лайки читаются из одного снимка базы.
+        await db.connection(
+            execution_options={"isolation_level": "REPEATABLE READ"}
+        )
+        async for chunk in stream_lines(db, "media", media_query(user_id)):
+            yield chunk
+        async for chunk in stream_lines(db, "like", likes_query(user_id)):
+            yield chunk
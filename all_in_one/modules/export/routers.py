@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from ...core.replica import get_replica_monitor
+from ..auth.dependencies import get_current_active_user
+from ..auth.models import User
+from ..auth.schemas import UserWithoutPassword
+from .exporter import export_lines
+
+router = APIRouter()
+
+
+@router.get(
+    "/api/export/",
+    tags=["Export"],
+    name="Выгрузка данных пользователя",
+    description="Выгружает профиль, медиа и лайки текущего пользователя в формате NDJSON: по одному JSON-объекту на строку, первым идет профиль. Ответ передается потоком по мере чтения из БД, поэтому выгрузка начинается сразу при любом объеме данных.",
+    response_class=StreamingResponse,
+)
+async def export_user_data(
+    request: Request, user: User = Depends(get_current_active_user)
+):
+    use_replica = get_replica_monitor().use_replica(
+        request.method, request.cookies
+    )
+    return StreamingResponse(
+        export_lines(
+            UserWithoutPassword.model_validate(user), user.id, use_replica
+        ),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="export-{user.username}.ndjson"'
+            ),
+            "Cache-Control": "no-store",
+        },
+    )
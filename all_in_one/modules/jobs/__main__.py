@@ -0,0 +1,45 @@
+# Запуск воркера фоновых задач отдельно от API:
+#     python -m all_in_one.modules.jobs
+#     python -m all_in_one.modules.jobs --queues default:4,telegram:2
+#
+# В этом случае в API воркер выключают: JOBS_RUN_IN_API=false.
+
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from ...core.config import settings
+from .worker import Worker, load_job_modules
+
+
+def parse_queues(value: str) -> dict[str, int]:
+    queues = {}
+    for item in value.split(","):
+        name, _, concurrency = item.partition(":")
+        queues[name.strip()] = int(concurrency or 1)
+    return queues
+
+
+async def main(queues: dict[str, int]) -> None:
+    load_job_modules()
+    worker = Worker(queues, settings.JOBS_POLL_INTERVAL_SECONDS)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    worker.start()
+    logging.info(f"Воркер {worker.worker_id} слушает очереди {queues}")
+    await stopping.wait()
+    logging.info("Остановка воркера")
+    await worker.stop(settings.JOBS_SHUTDOWN_TIMEOUT_SECONDS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queues", type=parse_queues, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.queues or settings.JOBS_QUEUES))
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    Text,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from all_in_one.core.db import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(BigInteger, primary_key=True)
+    queue = Column(String(50), nullable=False, default="default")
+    name = Column(String(100), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+    # queued -> running -> done | failed; при ошибке с оставшимися
+    # попытками задача снова становится queued с отложенным run_at.
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+    # Прогресс долгих задач, задача обновляет его сама.
+    progress = Column(JSONB, nullable=True)
+    # Защита от дублей, например одного запуска периодической задачи
+    # несколькими воркерами.
+    dedup_key = Column(String(200), nullable=True, unique=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Частичные индексы: выборка готовых к запуску задач очереди и поиск
+    # зависших задач не читают завершенные строки.
+    __table_args__ = (
+        Index(
+            "ix_jobs_queue_run_at_queued",
+            queue,
+            run_at,
+            id,
+            postgresql_where=text("status = 'queued'"),
+        ),
+        Index(
+            "ix_jobs_locked_at_running",
+            locked_at,
+            postgresql_where=text("status = 'running'"),
+        ),
+        Index("ix_jobs_finished_at", finished_at),
+    )
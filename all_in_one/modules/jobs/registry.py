@@ -0,0 +1,75 @@
+# Реестр обработчиков фоновых задач. Обработчик регистрируется декоратором
+# job и вызывается воркером как func(context, **payload).
+
+
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from sqlalchemy import update
+
+from ...core.db import async_session
+from .models import Job
+
+JobHandler = Callable[..., Awaitable[None]]
+
+
+class JobContext:
+    def __init__(self, job_id: int, attempt: int, worker_id: str) -> None:
+        self.job_id = job_id
+        self.attempt = attempt
+        self.worker_id = worker_id
+
+    async def set_progress(self, progress: dict) -> None:
+        # Отдельная короткая транзакция: прогресс виден сразу, а не после
+        # завершения задачи. Заодно продлевает блокировку задачи.
+        async with async_session() as db:
+            await db.execute(
+                update(Job)
+                .where(
+                    Job.id == self.job_id,
+                    Job.status == "running",
+                    Job.locked_by == self.worker_id,
+                )
+                .values(progress=progress, locked_at=datetime.utcnow())
+            )
+            await db.commit()
+
+
+class JobSpec:
+    def __init__(
+        self,
+        name: str,
+        func: JobHandler,
+        queue: str,
+        max_attempts: int | None,
+        every: float | Callable[[], float] | None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self._every = every
+
+    @property
+    def every(self) -> float | None:
+        # Интервал можно передать функцией, чтобы не читать настройки при
+        # импорте модуля с обработчиками.
+        return self._every() if callable(self._every) else self._every
+
+
+JOBS: dict[str, JobSpec] = {}
+
+
+def job(
+    name: str,
+    queue: str = "default",
+    max_attempts: int | None = None,
+    every: float | Callable[[], float] | None = None,
+):
+    def decorator(func: JobHandler) -> JobHandler:
+        if name in JOBS:
+            raise ValueError(f"Задача {name} уже зарегистрирована")
+        JOBS[name] = JobSpec(name, func, queue, max_attempts, every)
+        return func
+
+    return decorator
@@ -0,0 +1,220 @@
+# Запросы к таблице jobs. Воркеры забирают задачи через
+# SELECT ... FOR UPDATE SKIP LOCKED: строки, которые уже взял другой
+# воркер, пропускаются без ожидания блокировки.
+
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import Row, case, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.db import delete_in_chunks
+from .models import Job
+from .registry import JOBS
+
+NOTIFY_CHANNEL = "jobs"
+
+
+async def enqueue_job(
+    db: AsyncSession,
+    name: str,
+    payload: dict | None = None,
+    *,
+    queue: str | None = None,
+    run_at: datetime | None = None,
+    max_attempts: int | None = None,
+    dedup_key: str | None = None,
+    commit: bool = True,
+) -> int | None:
+    # Параметры по умолчанию берутся из зарегистрированного обработчика,
+    # если его модуль импортирован. API может ставить задачи по имени, не
+    # импортируя обработчики. Если задача с тем же dedup_key уже есть,
+    # возвращается None.
+    spec = JOBS.get(name)
+    queue = queue or (spec.queue if spec else "default")
+    max_attempts = (
+        max_attempts
+        or (spec.max_attempts if spec else None)
+        or settings.JOBS_MAX_ATTEMPTS
+    )
+    result = await db.execute(
+        insert(Job)
+        .values(
+            queue=queue,
+            name=name,
+            payload=payload or {},
+            max_attempts=max_attempts,
+            run_at=run_at or datetime.utcnow(),
+            dedup_key=dedup_key,
+        )
+        .on_conflict_do_nothing(index_elements=[Job.dedup_key])
+        .returning(Job.id)
+    )
+    job_id = result.scalar_one_or_none()
+    if job_id is not None:
+        # NOTIFY доставляется при коммите, вместе с самой задачей.
+        await db.execute(select(func.pg_notify(NOTIFY_CHANNEL, queue)))
+    if commit:
+        await db.commit()
+    return job_id
+
+
+async def claim_jobs(
+    db: AsyncSession, queue: str, limit: int, worker_id: str
+) -> list[Row]:
+    now = datetime.utcnow()
+    ready = (
+        select(Job.id)
+        .where(Job.queue == queue, Job.status == "queued", Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Job)
+        .where(Job.id.in_(ready.scalar_subquery()))
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            locked_at=now,
+            locked_by=worker_id,
+        )
+        .returning(
+            Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts
+        )
+        .execution_options(synchronize_session=False)
+    )
+    jobs = list(result)
+    await db.commit()
+    return jobs
+
+
+def _owned(job_id: int, worker_id: str):
+    # Задачу завершает только тот воркер, который ее держит: если блокировка
+    # истекла и задачу забрал другой, поздний ответ ничего не меняет.
+    return (
+        (Job.id == job_id)
+        & (Job.status == "running")
+        & (Job.locked_by == worker_id)
+    )
+
+
+async def heartbeat_jobs(
+    db: AsyncSession, job_ids: list[int], worker_id: str
+) -> set[int]:
+    # Продлеваем блокировку выполняющихся задач. Возвращает id задач, которые
+    # все еще за этим воркером.
+    if not job_ids:
+        return set()
+    result = await db.execute(
+        update(Job)
+        .where(
+            Job.id.in_(job_ids),
+            Job.status == "running",
+            Job.locked_by == worker_id,
+        )
+        .values(locked_at=datetime.utcnow())
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    )
+    owned = set(result.scalars())
+    await db.commit()
+    return owned
+
+
+async def complete_job(db: AsyncSession, job_id: int, worker_id: str) -> None:
+    await db.execute(
+        update(Job)
+        .where(_owned(job_id, worker_id))
+        .values(
+            status="done",
+            locked_at=None,
+            locked_by=None,
+            last_error=None,
+            finished_at=datetime.utcnow(),
+        )
+    )
+    await db.commit()
+
+
+async def fail_job(
+    db: AsyncSession,
+    job_id: int,
+    worker_id: str,
+    attempts: int,
+    max_attempts: int,
+    error: str,
+    retry_in: float,
+) -> None:
+    now = datetime.utcnow()
+    if attempts < max_attempts:
+        values = {
+            "status": "queued",
+            "run_at": now + timedelta(seconds=retry_in),
+        }
+    else:
+        values = {"status": "failed", "finished_at": now}
+    await db.execute(
+        update(Job)
+        .where(_owned(job_id, worker_id))
+        .values(locked_at=None, locked_by=None, last_error=error, **values)
+    )
+    await db.commit()
+
+
+async def release_job(db: AsyncSession, job_id: int, worker_id: str) -> None:
+    # Задача прервана остановкой воркера: возвращаем ее в очередь, не
+    # засчитывая попытку.
+    await db.execute(
+        update(Job)
+        .where(_owned(job_id, worker_id))
+        .values(
+            status="queued",
+            attempts=Job.attempts - 1,
+            locked_at=None,
+            locked_by=None,
+        )
+    )
+    await db.commit()
+
+
+async def requeue_stale_jobs(db: AsyncSession, locked_before: datetime) -> int:
+    # Воркер упал, не завершив задачу: попытка засчитана, задача снова в
+    # очереди, если попытки остались, иначе помечается failed.
+    exhausted = Job.attempts >= Job.max_attempts
+    result = await db.execute(
+        update(Job)
+        .where(Job.status == "running", Job.locked_at < locked_before)
+        .values(
+            status=case((exhausted, "failed"), else_="queued"),
+            finished_at=case((exhausted, datetime.utcnow()), else_=None),
+            locked_at=None,
+            locked_by=None,
+            last_error="Worker lost the job lock",
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def purge_finished_jobs(
+    db: AsyncSession, finished_before: datetime, chunk_size: int
+) -> int:
+    return await delete_in_chunks(
+        db,
+        Job,
+        Job.status.in_(("done", "failed"))
+        & (Job.finished_at < finished_before),
+        chunk_size,
+    )
+
+
+async def count_jobs(db: AsyncSession) -> list[Row]:
+    result = await db.execute(
+        select(Job.queue, Job.status, func.count())
+        .group_by(Job.queue, Job.status)
+        .order_by(Job.queue, Job.status)
+    )
+    return list(result)
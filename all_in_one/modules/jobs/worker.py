@@ -0,0 +1,266 @@
+# Воркер фоновых задач. Для каждой очереди свой цикл: забирает готовые
+# задачи пачкой, не больше свободных слотов очереди, и ждет либо NOTIFY о
+# новой задаче, либо освобождения слота, либо истечения интервала опроса.
+# Лимит параллельности очереди действует в пределах одного процесса.
+#
+# Пока задача выполняется, воркер продлевает ее блокировку (locked_at) раз в
+# четверть JOBS_LOCK_TIMEOUT_SECONDS. Зависшими считаются только задачи
+# упавших воркеров. Если блокировку все же перехватили, задача отменяется.
+
+
+import asyncio
+import contextlib
+import importlib
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Row, text
+
+from ...core.config import settings
+from ...core.db import async_session, get_engine
+from ...core.periodic import PeriodicTask
+from .registry import JOBS, JobContext
+from .repositories import (
+    NOTIFY_CHANNEL,
+    claim_jobs,
+    complete_job,
+    enqueue_job,
+    fail_job,
+    heartbeat_jobs,
+    purge_finished_jobs,
+    release_job,
+    requeue_stale_jobs,
+)
+
+# Модули с обработчиками, которые импортирует воркер.
+JOB_MODULES = ("all_in_one.modules.auth.jobs",)
+
+
+def retry_delay(attempt: int) -> float:
+    # Экспоненциальная пауза со случайным разбросом, чтобы упавшие вместе
+    # задачи не повторялись одновременно.
+    delay = min(
+        settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempt - 1),
+        settings.JOBS_RETRY_MAX_SECONDS,
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Worker:
+    def __init__(self, queues: dict[str, int], poll_interval: float) -> None:
+        self.queues = queues
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeups = {queue: asyncio.Event() for queue in queues}
+        self._in_flight: dict[str, set[asyncio.Task]] = {
+            queue: set() for queue in queues
+        }
+        self._running: dict[int, asyncio.Task] = {}
+        self._loops: list[asyncio.Task] = []
+        self._periodic_slots: dict[str, int] = {}
+        self._housekeeping = [
+            PeriodicTask("jobs-schedule", 1, self._schedule_periodic),
+            PeriodicTask(
+                "jobs-heartbeat",
+                settings.JOBS_LOCK_TIMEOUT_SECONDS / 4,
+                self._heartbeat,
+            ),
+            PeriodicTask(
+                "jobs-requeue-stale",
+                settings.JOBS_LOCK_TIMEOUT_SECONDS / 2,
+                self._requeue_stale,
+            ),
+            PeriodicTask("jobs-purge-finished", 3600, self._purge_finished),
+        ]
+
+    def _on_notify(self, connection, pid, channel, queue) -> None:
+        event = self._wakeups.get(queue)
+        if event is not None:
+            event.set()
+
+    async def _listen(self) -> None:
+        # LISTEN держим на отдельном соединении. Без asyncpg или при обрыве
+        # воркер продолжает работать на опросе раз в poll_interval.
+        while True:
+            try:
+                connection = await get_engine().connect()
+                try:
+                    raw_connection = await connection.get_raw_connection()
+                    driver = raw_connection.driver_connection
+                    if not hasattr(driver, "add_listener"):
+                        logging.info("LISTEN недоступен, задачи ищем опросом")
+                        return
+                    await driver.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                    # Задачи, поставленные, пока не слушали.
+                    for event in self._wakeups.values():
+                        event.set()
+                    while True:
+                        await asyncio.sleep(self.poll_interval)
+                        await connection.execute(text("SELECT 1"))
+                        await connection.commit()
+                finally:
+                    # Соединение с подпиской не возвращаем в пул.
+                    with contextlib.suppress(Exception):
+                        await connection.invalidate()
+                    await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Ошибка подписки на новые задачи")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _execute(self, queue: str, job: Row) -> None:
+        try:
+            spec = JOBS.get(job.name)
+            if spec is None:
+                raise LookupError(f"Неизвестная задача {job.name}")
+            await spec.func(
+                JobContext(job.id, job.attempts, self.worker_id), **job.payload
+            )
+        except asyncio.CancelledError:
+            async with async_session() as db:
+                await release_job(db, job.id, self.worker_id)
+            raise
+        except Exception as err:
+            logging.exception(f"Ошибка в задаче {job.name} #{job.id}")
+            async with async_session() as db:
+                await fail_job(
+                    db,
+                    job.id,
+                    self.worker_id,
+                    job.attempts,
+                    job.max_attempts,
+                    repr(err),
+                    retry_delay(job.attempts),
+                )
+        else:
+            async with async_session() as db:
+                await complete_job(db, job.id, self.worker_id)
+
+    def _start_job(self, queue: str, job: Row) -> None:
+        task = asyncio.create_task(
+            self._execute(queue, job), name=f"job-{job.name}-{job.id}"
+        )
+        in_flight = self._in_flight[queue]
+        in_flight.add(task)
+        self._running[job.id] = task
+
+        def done(finished: asyncio.Task) -> None:
+            in_flight.discard(finished)
+            self._running.pop(job.id, None)
+            # Освободился слот: можно забрать следующую задачу.
+            self._wakeups[queue].set()
+
+        task.add_done_callback(done)
+
+    async def _consume(self, queue: str, concurrency: int) -> None:
+        wakeup = self._wakeups[queue]
+        while True:
+            wakeup.clear()
+            free = concurrency - len(self._in_flight[queue])
+            if free > 0:
+                try:
+                    async with async_session() as db:
+                        jobs = await claim_jobs(
+                            db, queue, free, self.worker_id
+                        )
+                except Exception:
+                    logging.exception(f"Не удалось забрать задачи {queue}")
+                    jobs = []
+                for job in jobs:
+                    self._start_job(queue, job)
+                # Забрали все, что поместилось: возможно, готовых задач
+                # больше, следующую пачку заберем по освобождению слота.
+                if jobs and len(jobs) == free:
+                    continue
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+
+    async def _schedule_periodic(self) -> None:
+        # Каждый воркер пытается поставить очередной запуск, а dedup_key с
+        # номером интервала оставляет только одну задачу на интервал.
+        now = time.time()
+        for spec in JOBS.values():
+            every = spec.every
+            if every is None or spec.queue not in self.queues:
+                continue
+            slot = int(now // every)
+            if self._periodic_slots.get(spec.name) == slot:
+                continue
+            async with async_session() as db:
+                await enqueue_job(
+                    db, spec.name, dedup_key=f"{spec.name}:{slot}"
+                )
+            self._periodic_slots[spec.name] = slot
+
+    async def _heartbeat(self) -> None:
+        running = dict(self._running)
+        async with async_session() as db:
+            owned = await heartbeat_jobs(db, list(running), self.worker_id)
+        for job_id, task in running.items():
+            if job_id not in owned and not task.done():
+                logging.warning(
+                    f"Блокировка задачи #{job_id} потеряна, задача отменена"
+                )
+                task.cancel()
+
+    async def _requeue_stale(self) -> None:
+        locked_before = datetime.utcnow() - timedelta(
+            seconds=settings.JOBS_LOCK_TIMEOUT_SECONDS
+        )
+        async with async_session() as db:
+            requeued = await requeue_stale_jobs(db, locked_before)
+        if requeued:
+            logging.warning(f"Возвращено в очередь зависших задач: {requeued}")
+
+    async def _purge_finished(self) -> None:
+        finished_before = datetime.utcnow() - timedelta(
+            hours=settings.JOBS_RETENTION_HOURS
+        )
+        async with async_session() as db:
+            deleted = await purge_finished_jobs(
+                db, finished_before, settings.PURGE_CHUNK_SIZE
+            )
+        if deleted:
+            logging.info(f"Удалено завершенных задач: {deleted}")
+
+    def start(self) -> None:
+        self._loops = [
+            asyncio.create_task(self._listen(), name="jobs-listen"),
+            *(
+                asyncio.create_task(
+                    self._consume(queue, concurrency), name=f"jobs-{queue}"
+                )
+                for queue, concurrency in self.queues.items()
+            ),
+        ]
+        for task in self._housekeeping:
+            task.start()
+
+    async def stop(self, timeout: float) -> None:
+        # Новые задачи больше не забираем, текущим даем timeout секунд на
+        # завершение, остальные прерываем и возвращаем в очередь.
+        for task in self._loops:
+            task.cancel()
+        for task in self._housekeeping:
+            await task.stop()
+        for task in self._loops:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        running = [
+            task for tasks in self._in_flight.values() for task in tasks
+        ]
+        if running:
+            _, pending = await asyncio.wait(running, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def load_job_modules() -> None:
+    for module in JOB_MODULES:
+        importlib.import_module(module)
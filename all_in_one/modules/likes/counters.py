@@ -0,0 +1,138 @@
+# Счетчик лайков в media.like_count обновляется не на каждый лайк, а пачкой:
+# изменения копятся в памяти и раз в LIKE_COUNTER_FLUSH_INTERVAL_MS
+# записываются одним executemany UPDATE. Так популярная запись в media
+# блокируется один раз за интервал, а не на каждый лайк.
+
+
+import asyncio
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..content.models import Media
+from .models import Likes
+
+media_table = Media.__table__
+
+
+class LikeCounterAccumulator:
+    def __init__(self) -> None:
+        self._deltas: dict[int, int] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._deltas)
+
+    def add(self, media_id: int, delta: int) -> None:
+        self._deltas[media_id] = self._deltas.get(media_id, 0) + delta
+
+    async def flush(self, db: AsyncSession) -> int:
+        deltas, self._deltas = self._deltas, {}
+        # Сортировка по id задает одинаковый порядок блокировок во всех
+        # воркерах и исключает взаимные блокировки.
+        params = [
+            {"media_id": media_id, "delta": delta}
+            for media_id, delta in sorted(deltas.items())
+            if delta
+        ]
+        if not params:
+            return 0
+        try:
+            await db.execute(
+                update(media_table)
+                .where(media_table.c.id == bindparam("media_id"))
+                .values(
+                    like_count=media_table.c.like_count + bindparam("delta")
+                ),
+                params,
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            for media_id, delta in deltas.items():
+                self.add(media_id, delta)
+            raise
+        return len(params)
+
+
+def _exact_count():
+    return (
+        select(func.count(Likes.id))
+        .where(Likes.media_id == media_table.c.id)
+        .scalar_subquery()
+    )
+
+
+async def find_like_count_mismatches(
+    db: AsyncSession, chunk_size: int
+) -> dict[int, tuple[int, int]]:
+    # media_id -> (like_count, точное значение) по диапазонам id, каждый
+    # диапазон в своей транзакции.
+    exact_count = _exact_count()
+    max_id = (await db.execute(select(func.max(media_table.c.id)))).scalar()
+    mismatches = {}
+    start = 0
+    while max_id is not None and start < max_id:
+        end = start + chunk_size
+        result = await db.execute(
+            select(media_table.c.id, media_table.c.like_count, exact_count)
+            .where(
+                media_table.c.id > start,
+                media_table.c.id <= end,
+                media_table.c.like_count != exact_count,
+            )
+            .order_by(media_table.c.id)
+        )
+        for media_id, like_count, exact in result:
+            mismatches[media_id] = (like_count, exact)
+        await db.commit()
+        start = end
+    return mismatches
+
+
+async def fix_like_counts(
+    db: AsyncSession, mismatches: dict[int, tuple[int, int]], chunk_size: int
+) -> int:
+    # Строка исправляется, только если с момента поиска не изменились ни
+    # like_count, ни число лайков.
+    statement = (
+        update(media_table)
+        .where(
+            media_table.c.id == bindparam("media_id"),
+            media_table.c.like_count == bindparam("seen_count"),
+            _exact_count() == bindparam("exact"),
+        )
+        .values(like_count=bindparam("exact"))
+    )
+    params = [
+        {"media_id": media_id, "seen_count": like_count, "exact": exact}
+        for media_id, (like_count, exact) in sorted(mismatches.items())
+    ]
+    fixed = 0
+    for start in range(0, len(params), chunk_size):
+        result = await db.execute(
+            statement, params[start : start + chunk_size]
+        )
+        await db.commit()
+        fixed += result.rowcount
+    return fixed
+
+
+async def reconcile_like_counts(
+    db: AsyncSession, chunk_size: int, settle_seconds: float
+) -> int:
+    # Пересчет точных значений по таблице likes в два прохода. Расхождение
+    # бывает и временным: лайк уже в likes, а его изменение еще копится в
+    # памяти какого-то воркера. Если записать точное значение сразу, этот
+    # воркер потом прибавит изменение второй раз. Поэтому сначала находим
+    # расхождения, ждем дольше интервала сброса и исправляем только строки,
+    # в которых за это время ничего не изменилось: несброшенное изменение
+    # за паузу успело бы поменять like_count.
+    mismatches = await find_like_count_mismatches(db, chunk_size)
+    if not mismatches:
+        return 0
+    await asyncio.sleep(settle_seconds)
+    return await fix_like_counts(db, mismatches, chunk_size)
+
+
+like_counter = LikeCounterAccumulator()
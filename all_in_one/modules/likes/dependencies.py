@@ -0,0 +1,79 @@
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.db import db_utcnow
+from ...core.notify import publish
+from .counters import like_counter
+from .models import Likes
+
+# Удаление лайка рассылается всем воркерам: рейтинг популярного в каждом
+# процессе вычитает его вклад (content.trending.handle_like_removed).
+LIKE_REMOVED_CHANNEL = "like_removed"
+
+
+async def add_like(db: AsyncSession, user_id: int, media_id: int) -> bool:
+    # Повторный лайк не ошибка: ON CONFLICT DO NOTHING по уникальной паре
+    # (user_id, media_id), счетчик меняем только если строка добавилась.
+    try:
+        result = await db.execute(
+            insert(Likes)
+            # Время по часам БД: по нему рейтинг ищет новые лайки.
+            .values(user_id=user_id, media_id=media_id, created_at=db_utcnow())
+            .on_conflict_do_nothing(
+                index_elements=[Likes.user_id, Likes.media_id]
+            )
+            .returning(Likes.id)
+        )
+        inserted = result.scalar_one_or_none() is not None
+        await db.commit()
+    except IntegrityError as err:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Media not found") from err
+    if inserted:
+        like_counter.add(media_id, 1)
+    return inserted
+
+
+async def remove_like(db: AsyncSession, user_id: int, media_id: int) -> bool:
+    result = await db.execute(
+        delete(Likes)
+        .where(Likes.user_id == user_id, Likes.media_id == media_id)
+        .returning(Likes.id, Likes.created_at)
+    )
+    row = result.one_or_none()
+    deleted = row is not None
+    if deleted:
+        await publish(
+            db,
+            LIKE_REMOVED_CHANNEL,
+            json.dumps(
+                {
+                    "id": row.id,
+                    "media_id": media_id,
+                    "created_at": row.created_at.isoformat(),
+                }
+            ),
+        )
+    await db.commit()
+    if deleted:
+        like_counter.add(media_id, -1)
+    return deleted
+
+
+async def get_liked_media_ids(
+    db: AsyncSession, user_id: int, media_ids: list[int]
+) -> set[int]:
+    # Одним запросом на страницу, а не по запросу на каждое медиа.
+    if not media_ids:
+        return set()
+    result = await db.execute(
+        select(Likes.media_id).where(
+            Likes.user_id == user_id, Likes.media_id.in_(media_ids)
+        )
+    )
+    return set(result.scalars())
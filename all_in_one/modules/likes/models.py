@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from all_in_one.core.db import Base
@@ -15,6 +15,12 @@ class Likes(Base):
     media_id = Column(
         Integer, ForeignKey("media.id"), nullable=False, index=True
     )
-    created_at = Column(DateTime, default=datetime.utcnow)
-    user = relationship("User", back_populates="likes")
-    media = relationship("Media", back_populates="likes")
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    user = relationship("User", back_populates="likes", lazy="raise_on_sql")
+    media = relationship("Media", back_populates="likes", lazy="raise_on_sql")
+
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "media_id", name="uq_likes_user_id_media_id"
+        ),
+    )
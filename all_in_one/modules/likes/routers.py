@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.dependencies import get_db
+from ..auth.dependencies import get_current_active_user
+from ..auth.models import User
+from .dependencies import add_like, remove_like
+from .schemas import LikeStatus
+
+router = APIRouter()
+
+
+@router.post(
+    "/api/media/{media_id}/like/",
+    tags=["Likes"],
+    name="Поставить лайк",
+    description="Ставит лайк от текущего пользователя. Повторный лайк ничего не меняет. Счетчик лайков у медиа обновляется с небольшой задержкой.",
+    response_model=LikeStatus,
+)
+async def like_media(
+    media_id: int,
+    user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await add_like(db, user_id=user.id, media_id=media_id)
+    return LikeStatus(media_id=media_id, liked=True)
+
+
+@router.delete(
+    "/api/media/{media_id}/like/",
+    tags=["Likes"],
+    name="Убрать лайк",
+    description="Убирает лайк текущего пользователя, если он был. Счетчик лайков у медиа обновляется с небольшой задержкой.",
+    response_model=LikeStatus,
+)
+async def unlike_media(
+    media_id: int,
+    user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await remove_like(db, user_id=user.id, media_id=media_id)
+    return LikeStatus(media_id=media_id, liked=False)
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class LikeStatus(BaseModel):
+    media_id: int
+    liked: bool
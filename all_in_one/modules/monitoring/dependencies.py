@@ -0,0 +1,19 @@
+import hmac
+
+from fastapi import Header, HTTPException, status
+
+from ...core.config import settings
+
+
+async def verify_internal_token(authorization: str | None = Header(None)):
+    expected_token = settings.INTERNAL_API_TOKEN
+    if not expected_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), expected_token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
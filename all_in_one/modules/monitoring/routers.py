@@ -0,0 +1,176 @@
+# Служебные эндпоинты для наблюдения за состоянием приложения. Доступны
+# только с токеном INTERNAL_API_TOKEN, без него отвечают 404.
+
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.db import pool_status
+from ...core.dependencies import get_db
+from ...core.metrics import registry, sample
+from ...core.replica import get_replica_monitor
+from ..auth.dependencies import get_user_cache
+from ..auth.hashing import get_password_hasher
+from ..content.search import get_title_index
+from ..content.trending import get_trending_index
+from ..jobs.repositories import count_jobs
+from ..likes.counters import like_counter
+from ..utils.bot_runner import get_bot_runner
+from .dependencies import verify_internal_token
+
+router = APIRouter(dependencies=[Depends(verify_internal_token)])
+
+
+def collect_service_metrics() -> list[str]:
+    lines: list[str] = []
+    hashing = get_password_hasher().stats.as_dict()
+    for operation, calls in hashing["calls"].items():
+        lines += sample(
+            f"password_hash_{operation}_total",
+            f"Выполнено операций {operation} в пуле bcrypt",
+            calls,
+            "counter",
+        )
+    lines += sample(
+        "password_hash_rejected_total",
+        "Отказы пула bcrypt из-за переполнения очереди",
+        hashing["rejected"],
+        "counter",
+    )
+    lines += sample(
+        "password_hash_in_flight",
+        "Задачи bcrypt в работе и в очереди",
+        hashing["in_flight"],
+    )
+    lines += sample(
+        "password_hash_queue_wait_avg_seconds",
+        "Среднее ожидание задачи bcrypt в очереди",
+        hashing["queue_wait_avg"],
+    )
+    lines += sample(
+        "password_hash_latency_avg_seconds",
+        "Среднее полное время операции bcrypt",
+        hashing["latency_avg"],
+    )
+    for key, value in pool_status().items():
+        lines += sample(f"db_pool_{key}", f"Пул соединений с БД: {key}", value)
+    replica = get_replica_monitor().stats()
+    lines += sample(
+        "db_replica_healthy",
+        "1, если чтения можно отправлять на реплику",
+        int(replica["healthy"]),
+    )
+    if replica["lag_seconds"] is not None:
+        lines += sample(
+            "db_replica_lag_seconds",
+            "Отставание реплики от primary",
+            replica["lag_seconds"],
+        )
+    for key in ("replica_reads", "primary_reads"):
+        lines += sample(
+            f"db_{key}_total",
+            f"Сессии для чтения: {key}",
+            replica[key],
+            "counter",
+        )
+    for key in ("size", "hits", "misses"):
+        lines += sample(
+            f"user_cache_{key}",
+            f"Кеш пользователей: {key}",
+            get_user_cache().stats()[key],
+        )
+    lines += sample(
+        "like_counter_pending",
+        "Записи media с еще не сброшенными изменениями счетчика лайков",
+        like_counter.pending,
+    )
+    trending = get_trending_index().stats()
+    for key in ("entries", "memory_bytes", "rebuild_seconds"):
+        lines += sample(
+            f"trending_index_{key}",
+            f"Рейтинг популярных медиа: {key}",
+            trending[key],
+        )
+    lines += sample(
+        "telegram_bot_leader",
+        "1, если в этом процессе работает Telegram-бот в режиме polling",
+        int(get_bot_runner().is_leader),
+    )
+    search = get_title_index().stats()
+    for key in ("titles", "postings", "rebuild_seconds"):
+        lines += sample(
+            f"search_index_{key}",
+            f"Поисковый индекс по названиям: {key}",
+            search[key],
+        )
+    return lines
+
+
+registry.register_collector(collect_service_metrics)
+
+
+@router.get(
+    "/metrics",
+    tags=["Monitoring"],
+    name="Метрики Prometheus",
+    description="Гистограммы времени ответа по маршрутам, количество и время SQL-запросов на запрос, состояние пула bcrypt, пула соединений и кешей в текстовом формате Prometheus.",
+    response_class=PlainTextResponse,
+)
+async def metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@router.get(
+    "/api/internal/hashing/",
+    tags=["Monitoring"],
+    name="Состояние пула хеширования паролей",
+    description="Количество операций bcrypt, отказов из-за перегрузки, задач в работе, а также среднее и максимальное время ожидания в очереди и полное время выполнения. По этим данным подбирается размер пула под число ядер.",
+)
+async def hashing_stats():
+    password_hasher = get_password_hasher()
+    return {
+        "executor": password_hasher.executor_type,
+        "workers": password_hasher.workers,
+        "max_pending": password_hasher.max_pending,
+        **password_hasher.stats.as_dict(),
+    }
+
+
+@router.get(
+    "/api/internal/caches/",
+    tags=["Monitoring"],
+    name="Состояние кешей процесса",
+    description="Размер, лимиты и количество попаданий и промахов кеша пользователей, а также размер и время пересборки рейтинга популярных медиа и поискового индекса.",
+)
+async def caches_stats():
+    return {
+        "users": get_user_cache().stats(),
+        "trending": get_trending_index().stats(),
+        "search": get_title_index().stats(),
+    }
+
+
+@router.get(
+    "/api/internal/db-pool/",
+    tags=["Monitoring"],
+    name="Состояние пула соединений с БД",
+    description="Размер пула, количество свободных и выданных соединений, переполнение, а также количество выдач, таймаутов и время ожидания свободного соединения. Для реплики показывается отставание и сколько чтений ушло на реплику и в primary.",
+)
+async def db_pool_stats():
+    return {**pool_status(), "replica": get_replica_monitor().stats()}
+
+
+@router.get(
+    "/api/internal/jobs/",
+    tags=["Monitoring"],
+    name="Состояние очереди фоновых задач",
+    description="Количество фоновых задач в каждой очереди по статусам: ожидают запуска, выполняются, завершены и завершены с ошибкой. Завершенные задачи хранятся JOBS_RETENTION_HOURS часов.",
+)
+async def jobs_stats(db: AsyncSession = Depends(get_db)):
+    stats: dict[str, dict[str, int]] = {}
+    for queue, status, count in await count_jobs(db):
+        stats.setdefault(queue, {})[status] = count
+    return stats
@@ -0,0 +1,116 @@
+# Запуск Telegram-бота в многопроцессном деплое. В режиме polling обновления
+# может забирать только один процесс, поэтому бот запускает лидер, выбранный
+# через advisory lock в Postgres. Блокировка держится, пока живо соединение
+# лидера: если процесс падает, Postgres ее освобождает и лидером становится
+# другой воркер. Остальные воркеры модули telegram вообще не импортируют.
+# В режиме webhook обновления приходят по HTTP в любой воркер, поэтому бот
+# запускается в каждом процессе, а лимит отправки делится между ними
+# (WEB_CONCURRENCY, см. telegram_outbox).
+
+
+import asyncio
+import contextlib
+import logging
+from functools import lru_cache
+
+from sqlalchemy import text
+
+from ...core.config import settings
+from ...core.db import get_engine
+
+
+async def _start_bot() -> None:
+    from .telegram_bot import run_bot
+
+    await run_bot()
+
+
+async def _stop_bot() -> None:
+    from .telegram_bot import stop_bot
+
+    await stop_bot()
+
+
+class BotRunner:
+    def __init__(self, lock_key: int, check_interval: float) -> None:
+        self.lock_key = lock_key
+        self.check_interval = check_interval
+        self.is_leader = False
+        self._task: asyncio.Task | None = None
+
+    async def _lead(self, connection) -> None:
+        self.is_leader = True
+        logging.info("Процесс стал лидером и запускает Telegram-бота")
+        try:
+            await _start_bot()
+            # Пока соединение отвечает, блокировка за нами.
+            while True:
+                await asyncio.sleep(self.check_interval)
+                await connection.execute(text("SELECT 1"))
+                await connection.commit()
+        finally:
+            self.is_leader = False
+            await _stop_bot()
+
+    async def _elect(self) -> None:
+        while True:
+            try:
+                connection = await get_engine().connect()
+                acquired = False
+                try:
+                    acquired = (
+                        await connection.execute(
+                            text("SELECT pg_try_advisory_lock(:key)"),
+                            {"key": self.lock_key},
+                        )
+                    ).scalar()
+                    await connection.commit()
+                    if acquired:
+                        await self._lead(connection)
+                finally:
+                    # Блокировка сессионная: соединение с ней нельзя вернуть
+                    # в пул, поэтому закрываем его совсем.
+                    if acquired:
+                        with contextlib.suppress(Exception):
+                            await connection.invalidate()
+                    await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Ошибка при выборе лидера для Telegram-бота")
+            await asyncio.sleep(self.check_interval)
+
+    async def _run_everywhere(self) -> None:
+        try:
+            await _start_bot()
+            await asyncio.Event().wait()
+        finally:
+            await _stop_bot()
+
+    def start(self) -> None:
+        if self._task is not None or settings.TELEGRAM_MODE == "disabled":
+            return
+        if settings.TELEGRAM_MODE == "webhook":
+            self._task = asyncio.create_task(
+                self._run_everywhere(), name="telegram-bot"
+            )
+        else:
+            self._task = asyncio.create_task(
+                self._elect(), name="telegram-bot-election"
+            )
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+@lru_cache
+def get_bot_runner() -> BotRunner:
+    return BotRunner(
+        lock_key=settings.TELEGRAM_LEADER_LOCK_KEY,
+        check_interval=settings.TELEGRAM_LEADER_CHECK_SECONDS,
+    )
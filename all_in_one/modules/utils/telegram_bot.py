@@ -1,56 +1,38 @@
 import logging
+from datetime import datetime, timedelta
 
-from sqlalchemy import select
-from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from telegram import Bot, Update
+from telegram import Update
 from telegram.ext import Application, CallbackContext, CommandHandler
 
 from ...core.config import settings
 from ...core.db import async_session
-from ...modules.auth.models import TokenForRegistrationTelegram
+from ...modules.auth.repositories import issue_registration_token
+from .telegram_outbox import OutboxFull, get_telegram_outbox
+from .telegram_webhook import get_update_dispatcher
 
 
 async def send_message(chat_id: str, message: str) -> None:
-    bot_token = settings.TELEGRAM_BOT_TOKEN
-    bot = Bot(token=bot_token)
-    await bot.send_message(chat_id=chat_id, text=message)
+    await get_telegram_outbox().send(chat_id, message)
 
 
 async def create_token_for_registration(
     update, chat_id: str, db: AsyncSession
 ):
-    try:
-        new_user_with_telegram_token = TokenForRegistrationTelegram(
-            chat_id=chat_id
-        )
-        db.add(new_user_with_telegram_token)
-        await db.commit()
-        await db.refresh(new_user_with_telegram_token)
-        return new_user_with_telegram_token
-    except IntegrityError:
-        await db.rollback()
-        result = await db.execute(
-            select(TokenForRegistrationTelegram).where(
-                TokenForRegistrationTelegram.chat_id == chat_id
-            )
-        )
-        existing_token = result.scalar_one_or_none()
-        if existing_token:
-            await update.message.reply_text(
-                "Вам уже была отправлена ссылка для регистрации на сайте"
-            )
-            logging.warning(
-                f"Пользователь уже имеет токен: {existing_token.registration_token}"
-            )
-            return existing_token
-        return None
-    except Exception as e:
-        await db.rollback()
-        logging.error(
-            f"Неожиданная ошибка при создании токена: {str(e)}", exc_info=True
+    now = datetime.utcnow()
+    registration_token, issued = await issue_registration_token(
+        db,
+        chat_id=chat_id,
+        now=now,
+        expires_at=now
+        + timedelta(minutes=settings.REGISTRATION_TOKEN_TTL_MINUTES),
+    )
+    if not issued:
+        await send_message(
+            chat_id, "Вам уже была отправлена ссылка для регистрации на сайте"
         )
-        raise
+        logging.warning(f"Пользователь уже имеет токен: {registration_token}")
+    return registration_token
 
 
 async def start(update: Update, context: CallbackContext) -> None:
@@ -61,31 +43,79 @@ async def start(update: Update, context: CallbackContext) -> None:
             token_info = await create_token_for_registration(
                 update, chat_id=chat_id, db=db
             )
-        message = f"http://localhost:5173/registration?key={token_info.registration_token}"
+        message = f"http://localhost:5173/registration?key={token_info}"
 
         await send_message(chat_id, message)
-        await update.message.reply_text(
-            "Перейдите по ссылке, чтобы зарегистрироваться на сайте"
+        await send_message(
+            chat_id, "Перейдите по ссылке, чтобы зарегистрироваться на сайте"
+        )
+    except OutboxFull:
+        # Сообщение об ошибке тоже не влезет в очередь.
+        logging.warning(
+            f"Очередь сообщений переполнена, ответ на /start в "
+            f"{update.message.chat_id} не отправлен"
         )
     except Exception as e:
         logging.error(f"Error: {e}")
-        await update.message.reply_text(
-            "Произошла ошибка. Попробуйте ещё раз."
+        await send_message(
+            str(update.message.chat_id),
+            "Произошла ошибка. Попробуйте ещё раз.",
         )
 
 
-bot_token = settings.TELEGRAM_BOT_TOKEN
-application = Application.builder().token(bot_token).build()
-application.add_handler(CommandHandler("start", start))
+# Application создается только при запуске бота, а не при импорте модуля:
+# воркеры, которые бот не запускают, его не строят.
+application: Application | None = None
+
+
+def build_application() -> Application:
+    builder = Application.builder().token(settings.TELEGRAM_BOT_TOKEN)
+    if settings.TELEGRAM_API_BASE_URL:
+        builder = builder.base_url(settings.TELEGRAM_API_BASE_URL)
+    new_application = builder.build()
+    new_application.add_handler(CommandHandler("start", start))
+    return new_application
 
 
 async def run_bot():
+    global application
+    application = build_application()
     await application.initialize()
+    get_telegram_outbox().start(application.bot)
     await application.start()
-    await application.updater.start_polling()
+    if settings.TELEGRAM_MODE == "webhook":
+        if not (
+            settings.TELEGRAM_WEBHOOK_URL and settings.TELEGRAM_WEBHOOK_SECRET
+        ):
+            raise RuntimeError(
+                "Для режима webhook нужны TELEGRAM_WEBHOOK_URL и "
+                "TELEGRAM_WEBHOOK_SECRET"
+            )
+        get_update_dispatcher().start(application)
+        await application.bot.set_webhook(
+            url=settings.TELEGRAM_WEBHOOK_URL,
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    else:
+        await application.updater.start_polling()
     return application
 
 
+async def stop_bot():
+    global application
+    if application is None:
+        return
+    if application.updater.running:
+        await application.updater.stop()
+    await get_update_dispatcher().stop()
+    await get_telegram_outbox().stop()
+    if application.running:
+        await application.stop()
+    await application.shutdown()
+    application = None
+
+
 if __name__ == "__main__":
     run_bot()
 
@@ -0,0 +1,230 @@
+# Очередь исходящих сообщений Telegram. Все отправки идут через один общий
+# клиент application.bot с ограничениями Telegram: не больше
+# TELEGRAM_GLOBAL_RATE сообщений в секунду всего и одно сообщение в
+# TELEGRAM_PER_CHAT_INTERVAL_SECONDS в один чат. Одинаковые сообщения в
+# один чат, еще ожидающие отправки, склеиваются в одно.
+#
+# В режиме webhook очередь своя в каждом процессе API, поэтому общий лимит
+# делится на WEB_CONCURRENCY: так суммарно процессы не превышают
+# TELEGRAM_GLOBAL_RATE. Ограничение на чат при этом действует в пределах
+# процесса.
+
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from telegram import Bot
+from telegram.error import NetworkError, RetryAfter, TelegramError
+
+from ...core.config import settings
+from ...core.metrics import registry, sample
+
+
+class OutboxFull(Exception):
+    pass
+
+
+class TelegramOutbox:
+    def __init__(
+        self,
+        global_rate: float,
+        per_chat_interval: float,
+        concurrency: int,
+        max_retries: int,
+        maxsize: int,
+    ) -> None:
+        self.global_interval = 1 / global_rate
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.maxsize = maxsize
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.retried = 0
+        # (момент готовности, порядковый номер, chat_id, текст, попытка)
+        self._heap: list[tuple[float, int, str, str, int]] = []
+        self._pending: set[tuple[str, str]] = set()
+        self._chat_next_slot: dict[str, float] = {}
+        self._next_global_slot = 0.0
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight: set[asyncio.Task] = set()
+        self._bot: Bot | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._heap) + len(self._in_flight)
+
+    def _schedule(
+        self, chat_id: str, text: str, attempt: int, not_before: float
+    ) -> None:
+        if len(self._chat_next_slot) > self.maxsize:
+            now = time.monotonic()
+            self._chat_next_slot = {
+                chat: slot
+                for chat, slot in self._chat_next_slot.items()
+                if slot > now
+            }
+        ready_at = max(not_before, self._chat_next_slot.get(chat_id, 0.0))
+        self._chat_next_slot[chat_id] = ready_at + self.per_chat_interval
+        heapq.heappush(
+            self._heap,
+            (ready_at, next(self._sequence), chat_id, text, attempt),
+        )
+        self._wakeup.set()
+
+    async def send(self, chat_id: str, text: str) -> None:
+        key = (chat_id, text)
+        if key in self._pending:
+            self.coalesced += 1
+            return
+        if self.depth >= self.maxsize:
+            raise OutboxFull("Очередь исходящих сообщений Telegram заполнена")
+        self._pending.add(key)
+        self._schedule(chat_id, text, attempt=0, not_before=time.monotonic())
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            ready_at = max(self._heap[0][0], self._next_global_slot)
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                # Ждем либо наступления срока, либо нового сообщения, которое
+                # может оказаться раньше в очереди.
+                self._wakeup.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                continue
+            _, _, chat_id, text, attempt = heapq.heappop(self._heap)
+            self._next_global_slot = time.monotonic() + self.global_interval
+            await self._semaphore.acquire()
+            task = asyncio.create_task(self._deliver(chat_id, text, attempt))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _deliver(self, chat_id: str, text: str, attempt: int) -> None:
+        try:
+            await self._bot.send_message(chat_id=chat_id, text=text)
+        except RetryAfter as err:
+            retry_after = err.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            # Flood control действует на весь бот, а не на один чат:
+            # останавливаем всю очередь до конца паузы.
+            self._next_global_slot = max(
+                self._next_global_slot, time.monotonic() + float(retry_after)
+            )
+            self._wakeup.set()
+            self._retry(chat_id, text, attempt, float(retry_after))
+        except NetworkError:
+            # TimedOut тоже NetworkError: повторяем с экспоненциальной паузой
+            self._retry(chat_id, text, attempt, 2**attempt)
+        except TelegramError:
+            self._fail(chat_id, text)
+            logging.exception(f"Не удалось отправить сообщение в {chat_id}")
+        except Exception:
+            # Иначе ключ останется в _pending и такие же сообщения в этот
+            # чат будут молча склеиваться с потерянным.
+            self._fail(chat_id, text)
+            logging.exception(
+                f"Непредвиденная ошибка при отправке сообщения в {chat_id}"
+            )
+        else:
+            self.sent += 1
+            self._pending.discard((chat_id, text))
+        finally:
+            self._semaphore.release()
+
+    def _retry(self, chat_id: str, text: str, attempt: int, delay: float):
+        if attempt >= self.max_retries:
+            self._fail(chat_id, text)
+            logging.error(
+                f"Сообщение в {chat_id} не отправлено после "
+                f"{attempt + 1} попыток"
+            )
+            return
+        self.retried += 1
+        self._schedule(
+            chat_id, text, attempt + 1, not_before=time.monotonic() + delay
+        )
+
+    def _fail(self, chat_id: str, text: str) -> None:
+        self.failed += 1
+        self._pending.discard((chat_id, text))
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        if self._worker is None:
+            self._worker = asyncio.create_task(
+                self._run(), name="telegram-outbox"
+            )
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+            self._worker = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self._heap:
+            logging.warning(
+                f"Не отправлено сообщений Telegram при остановке: "
+                f"{len(self._heap)}"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "coalesced": self.coalesced,
+        }
+
+
+@lru_cache
+def get_telegram_outbox() -> TelegramOutbox:
+    processes = (
+        settings.WEB_CONCURRENCY if settings.TELEGRAM_MODE == "webhook" else 1
+    )
+    return TelegramOutbox(
+        global_rate=settings.TELEGRAM_GLOBAL_RATE / processes,
+        per_chat_interval=settings.TELEGRAM_PER_CHAT_INTERVAL_SECONDS,
+        concurrency=settings.TELEGRAM_SEND_CONCURRENCY,
+        max_retries=settings.TELEGRAM_SEND_MAX_RETRIES,
+        maxsize=settings.TELEGRAM_OUTBOX_MAXSIZE,
+    )
+
+
+# Модуль импортируется только в процессе, где работает бот, поэтому метрики
+# очереди регистрируются здесь, а не в модуле мониторинга.
+def collect_outbox_metrics() -> list[str]:
+    outbox = get_telegram_outbox().stats()
+    lines = sample(
+        "telegram_outbox_depth",
+        "Сообщения Telegram в очереди и в отправке",
+        outbox["depth"],
+    )
+    for key in ("sent", "failed", "retried", "coalesced"):
+        lines += sample(
+            f"telegram_outbox_{key}_total",
+            f"Исходящие сообщения Telegram: {key}",
+            outbox[key],
+            "counter",
+        )
+    return lines
+
+
+registry.register_collector(collect_outbox_metrics)
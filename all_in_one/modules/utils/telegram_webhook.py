@@ -0,0 +1,152 @@
+# Режим webhook для Telegram-бота: обновления приходят POST-запросом в API,
+# проверяются по секретному токену и складываются в ограниченную очередь,
+# которую разбирают несколько обработчиков через application.process_update.
+
+
+import asyncio
+import contextlib
+import hmac
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Header, HTTPException, Request, status
+
+from ...core.config import settings
+from ...core.metrics import registry, sample
+
+# Сам telegram импортируется только там, где запущен бот: роутер подключен
+# во всех воркерах, но без бота сразу отвечает 404.
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import Application
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class UpdateDispatcher:
+    def __init__(self, maxsize: int, workers: int) -> None:
+        self.maxsize = maxsize
+        self.workers = workers
+        self.processed = 0
+        self.rejected = 0
+        self._queue: asyncio.Queue["Update"] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.application: "Application | None" = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def put(self, update: "Update") -> bool:
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.application.process_update(update)
+                self.processed += 1
+            except Exception:
+                logging.exception(
+                    f"Ошибка при обработке обновления {update.update_id}"
+                )
+            finally:
+                self._queue.task_done()
+
+    def start(self, application: "Application") -> None:
+        self.application = application
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"telegram-update-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+
+@lru_cache
+def get_update_dispatcher() -> UpdateDispatcher:
+    return UpdateDispatcher(
+        maxsize=settings.TELEGRAM_UPDATE_QUEUE_SIZE,
+        workers=settings.TELEGRAM_UPDATE_WORKERS,
+    )
+
+
+def collect_update_metrics() -> list[str]:
+    update_dispatcher = get_update_dispatcher()
+    return sample(
+        "telegram_update_queue_depth",
+        "Обновления Telegram, ожидающие обработки в режиме webhook",
+        update_dispatcher.depth,
+    ) + sample(
+        "telegram_update_rejected_total",
+        "Обновления Telegram, отклоненные из-за переполненной очереди",
+        update_dispatcher.rejected,
+        "counter",
+    )
+
+
+registry.register_collector(collect_update_metrics)
+
+
+router = APIRouter()
+
+
+@router.post(
+    "/api/telegram/webhook/",
+    tags=["Telegram"],
+    name="Webhook Telegram-бота",
+    description="Сюда Telegram присылает обновления бота в режиме webhook. Запрос проверяется по секретному токену из заголовка X-Telegram-Bot-Api-Secret-Token. Некорректное тело отклоняется с 400. Если очередь обновлений переполнена, возвращается 503 и Telegram повторит доставку позже.",
+    include_in_schema=False,
+)
+async def telegram_webhook(
+    request: Request,
+    secret_token: str | None = Header(None, alias=SECRET_TOKEN_HEADER),
+):
+    update_dispatcher = get_update_dispatcher()
+    if not update_dispatcher.running:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    expected_token = settings.TELEGRAM_WEBHOOK_SECRET
+    if (
+        not expected_token
+        or secret_token is None
+        or not hmac.compare_digest(
+            secret_token.encode(), expected_token.encode()
+        )
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    from telegram import Update
+
+    # Битое тело - ошибка отправителя, а не сервера: отвечаем 400.
+    try:
+        data = await request.json()
+        if not isinstance(data, dict):
+            raise ValueError("Update must be a JSON object")
+        update = Update.de_json(data, update_dispatcher.application.bot)
+    except (ValueError, TypeError, KeyError) as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed update"
+        ) from err
+    if not update_dispatcher.put(update):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Update queue is full",
+        )
+    return {"ok": True}
@@ -0,0 +1,226 @@
+# Нагрузочный бенчмарк сценария авторизации внутри процесса: приложение из
+# all_in_one.main.create_app() вызывается через httpx.ASGITransport, без
+# сети и uvicorn. Каждый сценарий: /api/login/ -> /api/token/ ->
+# /api/profile/ -> /api/logout/ для одного из заранее заведенных
+# пользователей. Результат печатается в JSON: пропускная способность и
+# p50/p95/p99 по каждому эндпоинту.
+#
+# Нужен Postgres (модели и запросы используют его диалект). Таблицы
+# создаются через create_all, пользователи bench_user_<i> добавляются, если
+# их еще нет. Бот не запускается (TELEGRAM_MODE=disabled).
+#
+# Запуск из корня репозитория модулем, чтобы импортировался all_in_one:
+#     ASYNC_DATABASE_URL=postgresql+asyncpg://... SECRET_KEY=... \
+#         python -m benchmarks.auth_load --users 500 --concurrency 32 \
+#         --flows 2000 --output run.json
+#
+# Сравнение с прошлым прогоном, ненулевой код при регрессии p95 больше
+# чем на 10%:
+#     python -m benchmarks.auth_load ... --baseline run.json \
+#         --max-regression 0.1
+
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+ENDPOINTS = ("login", "token", "profile", "logout")
+PASSWORD = "benchmark-password"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--flows", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--max-regression", type=float, default=0.1)
+    return parser.parse_args()
+
+
+def configure_environment() -> None:
+    # До импорта приложения: настройки читаются при первом обращении.
+    os.environ.setdefault("TELEGRAM_MODE", "disabled")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+    os.environ.setdefault("SYNC_DATABASE_URL", "postgresql://benchmark")
+
+
+async def seed_users(count: int) -> None:
+    from sqlalchemy.dialects.postgresql import insert
+
+    from all_in_one.core.db import Base, get_engine
+    from all_in_one.modules.auth.hashing import pwd_context
+    from all_in_one.modules.auth.models import User
+
+    async with get_engine().begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        # Один хеш на всех: bcrypt на каждого пользователя занял бы минуты.
+        hashed_password = pwd_context.hash(PASSWORD)
+        await connection.execute(
+            insert(User).on_conflict_do_nothing(
+                index_elements=[User.username]
+            ),
+            [
+                {
+                    "username": f"bench_user_{i}",
+                    "email": f"bench_user_{i}@example.com",
+                    "full_name": f"Bench User {i}",
+                    "hashed_password": hashed_password,
+                    "disabled": False,
+                }
+                for i in range(count)
+            ],
+        )
+
+
+async def run_flow(client, username: str, timings: dict, errors: dict):
+    async def timed(name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        timings[name].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors[name] += 1
+            return None
+        return response
+
+    login = await timed(
+        "login",
+        "POST",
+        "/api/login/",
+        json={"username": username, "password": PASSWORD},
+    )
+    if login is None:
+        return
+    access_token = login.json()["access_token"]
+    refresh_token = login.cookies.get("refresh_token")
+    auth = {"Authorization": f"Bearer {access_token}"}
+
+    await timed(
+        "token",
+        "GET",
+        "/api/token/",
+        headers={"Cookie": f"refresh_token={refresh_token}"},
+    )
+    await timed("profile", "GET", "/api/profile/", headers=auth)
+    await timed("logout", "POST", "/api/logout/", headers=auth)
+
+
+async def run_load(app, args) -> tuple[dict, dict, float]:
+    import httpx
+
+    timings: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    # Пользователи идут по кругу: токены детерминированы с точностью до
+    # секунды, поэтому повторный вход того же пользователя в ту же секунду
+    # получил бы уже отозванный токен. Пользователей должно быть больше,
+    # чем сценариев в секунду.
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="https://benchmark"
+    ) as client:
+
+        async def worker(flow_numbers, sink_timings, sink_errors) -> None:
+            for flow_number in flow_numbers:
+                username = f"bench_user_{flow_number % args.users}"
+                await run_flow(client, username, sink_timings, sink_errors)
+
+        async def run_flows(start: int, stop: int, sink_timings, sink_errors):
+            # Общий итератор: воркеры разбирают номера сценариев по одному.
+            flow_numbers = iter(range(start, stop))
+            await asyncio.gather(
+                *(
+                    worker(flow_numbers, sink_timings, sink_errors)
+                    for _ in range(args.concurrency)
+                )
+            )
+
+        await run_flows(0, args.warmup, defaultdict(list), defaultdict(int))
+        started = time.perf_counter()
+        await run_flows(args.warmup, args.warmup + args.flows, timings, errors)
+        elapsed = time.perf_counter() - started
+    return timings, errors, elapsed
+
+
+def summarize(samples: list[float], errors: int, elapsed: float) -> dict:
+    if len(samples) < 2:
+        return {"count": len(samples), "errors": errors}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    regressions = []
+    for name in ENDPOINTS:
+        current = report["endpoints"].get(name, {}).get("p95_ms")
+        previous = baseline["endpoints"].get(name, {}).get("p95_ms")
+        if current is None or previous is None:
+            continue
+        if current > previous * (1 + max_regression):
+            regressions.append(
+                f"{name}: p95 {current} мс против {previous} мс"
+            )
+    return regressions
+
+
+async def main() -> int:
+    args = parse_args()
+    configure_environment()
+
+    from all_in_one.main import create_app
+
+    await seed_users(args.users)
+    app = create_app()
+    # ASGITransport не отправляет lifespan-события, поэтому запускаем
+    # lifespan приложения вручную.
+    async with app.router.lifespan_context(app):
+        timings, errors, elapsed = await run_load(app, args)
+
+    report = {
+        "config": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "flows": args.flows,
+            "warmup": args.warmup,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "flows_per_second": round(args.flows / elapsed, 2),
+        "endpoints": {
+            name: summarize(timings[name], errors[name], elapsed)
+            for name in ENDPOINTS
+        },
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"РЕГРЕССИЯ: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,114 @@
+# Проверка холодного старта API: в отдельном процессе импортирует
+# all_in_one.main с -X importtime и собирает приложение через create_app().
+# Падает с ненулевым кодом, если импорт дольше бюджета, если подтянулись
+# тяжелые зависимости бота и драйвера БД или если при импорте были созданы
+# настройки или движок.
+#
+# Запуск из корня репозитория:
+#     python benchmarks/import_time.py --budget-ms 1500 --runs 5
+
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+FORBIDDEN_MODULES = ("telegram", "asyncpg")
+
+PROBE = """
+import sys
+
+import all_in_one.main as main
+from all_in_one.core.config import get_settings
+from all_in_one.core.db import get_engine
+
+main.create_app()
+loaded = sorted(
+    name for name in {forbidden!r} if name in sys.modules
+)
+print("forbidden=" + ",".join(loaded))
+print("settings=" + str(get_settings.cache_info().currsize))
+print("engine=" + str(get_engine.cache_info().currsize))
+"""
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    # Строки вида "import time:   123 |   4567 | package.module".
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative[parts[2].strip()] = int(parts[1])
+    return cumulative
+
+
+def run_once() -> tuple[float, dict[str, str], dict[str, int]]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            PROBE.format(forbidden=FORBIDDEN_MODULES),
+        ],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(result.returncode)
+    cumulative = parse_importtime(result.stderr)
+    checks = dict(
+        line.split("=", 1)
+        for line in result.stdout.splitlines()
+        if "=" in line
+    )
+    return cumulative.get("all_in_one.main", 0) / 1000, checks, cumulative
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = []
+    checks: dict[str, str] = {}
+    cumulative: dict[str, int] = {}
+    for _ in range(args.runs):
+        elapsed_ms, checks, cumulative = run_once()
+        timings.append(elapsed_ms)
+
+    median_ms = statistics.median(timings)
+    print(f"import all_in_one.main: медиана {median_ms:.1f} мс")
+    print(f"запуски: {', '.join(f'{t:.1f}' for t in timings)} мс")
+    print("самые долгие импорты (cumulative, мс):")
+    heaviest = sorted(cumulative.items(), key=lambda item: -item[1])
+    for name, micros in heaviest[: args.top]:
+        print(f"  {micros / 1000:8.1f}  {name}")
+
+    errors = []
+    if median_ms > args.budget_ms:
+        errors.append(
+            f"импорт занимает {median_ms:.1f} мс, бюджет {args.budget_ms} мс"
+        )
+    if checks.get("forbidden"):
+        errors.append(f"при импорте загружены: {checks['forbidden']}")
+    if checks.get("settings") != "0":
+        errors.append("Settings() создаются при импорте")
+    if checks.get("engine") != "0":
+        errors.append("движок БД создается при импорте")
+    for error in errors:
+        print(f"ОШИБКА: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# Сравнение стоимости сериализации ответа /api/login/ и /api/token/:
+# старый путь (model_validate -> jsonable_encoder -> JSONResponse с
+# json.dumps) против PydanticJSONResponse, который пишет модель сразу в
+# байты через pydantic-core. Базу и приложение не поднимает.
+#
+# Запуск из корня репозитория модулем, чтобы импортировался all_in_one:
+#     python -m benchmarks.json_response --number 20000
+
+
+import argparse
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from all_in_one.core.responses import PydanticJSONResponse
+from all_in_one.modules.auth.schemas import UserOutputInfo, UserWithoutPassword
+
+USER = SimpleNamespace(
+    id=42,
+    username="benchmark_user",
+    email="benchmark@example.com",
+    full_name="Benchmark User",
+    created_on=datetime(2024, 1, 1, 12, 0, 0),
+    updated_on=datetime(2024, 6, 1, 12, 0, 0),
+    disabled=False,
+    hashed_password="$2b$12$" + "x" * 53,
+)
+ACCESS_TOKEN = "header." + "p" * 180 + ".signature"
+
+
+def old_path() -> bytes:
+    user_data = jsonable_encoder(UserWithoutPassword.model_validate(USER))
+    return JSONResponse(
+        content={
+            "success": "Login successful",
+            "access_token": ACCESS_TOKEN,
+            "user_data": user_data,
+        }
+    ).body
+
+
+def new_path() -> bytes:
+    return PydanticJSONResponse(
+        UserOutputInfo(
+            success="Login successful",
+            access_token=ACCESS_TOKEN,
+            user_data=UserWithoutPassword.model_validate(USER),
+        )
+    ).body
+
+
+def measure(func, number: int, repeat: int) -> float:
+    # Лучшее из повторов, в микросекундах на один ответ.
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    assert len(old_path()) == len(new_path())
+
+    old = measure(old_path, args.number, args.repeat) * 1e6
+    new = measure(new_path, args.number, args.repeat) * 1e6
+    print(f"jsonable_encoder + JSONResponse: {old:7.2f} мкс/ответ")
+    print(f"PydanticJSONResponse:            {new:7.2f} мкс/ответ")
+    print(f"ускорение: x{old / new:.2f}")
+
+
+if __name__ == "__main__":
+    main()
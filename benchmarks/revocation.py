@@ -0,0 +1,160 @@
+# Задержка проверки отозванного токена при большом числе отзывов.
+#
+# memory - RevocationCache.is_revoked: то, что выполняется на каждом
+#     запросе. Кеш заполняется напрямую, без БД.
+# db - поиск по уникальному индексу revoked_tokens.token_digest: так
+#     проверяет повторный отзыв и читает синхронизация. Таблица заполняется
+#     через generate_series, строки bench-<i> добавляются, если их еще нет.
+#
+# Половина проверок попадает в отозванные токены, половина - нет.
+# Результат печатается в JSON: p50/p95/p99 в микросекундах.
+#
+# Запуск из корня репозитория модулем, чтобы импортировался all_in_one:
+#     python -m benchmarks.revocation memory --rows 10000000
+#     ASYNC_DATABASE_URL=postgresql+asyncpg://... \
+#         python -m benchmarks.revocation db --rows 10000000
+
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+SEED_BATCH = 1_000_000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", choices=("memory", "db"))
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    return parser.parse_args()
+
+
+def configure_environment() -> None:
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+    os.environ.setdefault("SYNC_DATABASE_URL", "postgresql://benchmark")
+    # Режиму memory база не нужна, но без адреса не создаются настройки.
+    os.environ.setdefault(
+        "ASYNC_DATABASE_URL", "postgresql+asyncpg://benchmark"
+    )
+
+
+def bench_token(i: int) -> str:
+    return f"bench-{i}"
+
+
+def sample_tokens(rows: int, lookups: int) -> list[str]:
+    # Отозванные bench-0..rows-1 и столько же неизвестных.
+    return [
+        bench_token(random.randrange(rows) + rows * (i % 2))
+        for i in range(lookups)
+    ]
+
+
+def summarize(samples: list[float], rows: int, mode: str) -> dict:
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "mode": mode,
+        "rows": rows,
+        "lookups": len(samples),
+        "mean_us": round(statistics.fmean(samples) * 1e6, 3),
+        "p50_us": round(cuts[49] * 1e6, 3),
+        "p95_us": round(cuts[94] * 1e6, 3),
+        "p99_us": round(cuts[98] * 1e6, 3),
+        "max_us": round(max(samples) * 1e6, 3),
+    }
+
+
+def bench_memory(args) -> dict:
+    from all_in_one.modules.auth.revocation import (
+        RevocationCache,
+        token_digest,
+    )
+
+    cache = RevocationCache()
+    expires_at = time.time() + 86400
+    for i in range(args.rows):
+        cache._remember(token_digest(bench_token(i)), expires_at)
+
+    samples = []
+    for token in sample_tokens(args.rows, args.lookups):
+        started = time.perf_counter()
+        cache.is_revoked(token)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, args.rows, "memory")
+
+
+async def seed_table(rows: int) -> None:
+    from sqlalchemy import text
+
+    from all_in_one.core.db import Base, get_engine
+    from all_in_one.modules.auth.models import RevokedToken
+
+    async with get_engine().begin() as connection:
+        await connection.run_sync(
+            Base.metadata.create_all, tables=[RevokedToken.__table__]
+        )
+    # Пачками по миллиону, каждая в своей транзакции.
+    for start in range(0, rows, SEED_BATCH):
+        async with get_engine().begin() as connection:
+            await connection.execute(
+                text(
+                    "INSERT INTO revoked_tokens "
+                    "(token_digest, expires_at, revoked_at) "
+                    "SELECT sha256(convert_to('bench-' || g, 'UTF8')), "
+                    "timezone('UTC', now()) + interval '1 day', "
+                    "timezone('UTC', now()) "
+                    "FROM generate_series(CAST(:start AS int), "
+                    "CAST(:stop AS int)) g "
+                    "ON CONFLICT DO NOTHING"
+                ),
+                {"start": start, "stop": min(start + SEED_BATCH, rows) - 1},
+            )
+    async with get_engine().begin() as connection:
+        await connection.execute(text("ANALYZE revoked_tokens"))
+
+
+async def bench_db(args) -> dict:
+    from sqlalchemy import select
+
+    from all_in_one.core.db import get_engine
+    from all_in_one.modules.auth.models import RevokedToken
+    from all_in_one.modules.auth.revocation import token_digest
+
+    await seed_table(args.rows)
+    query = select(RevokedToken.id).where(
+        RevokedToken.token_digest == token_digest("warmup")
+    )
+    samples = []
+    async with get_engine().connect() as connection:
+        await connection.execute(query)
+        for token in sample_tokens(args.rows, args.lookups):
+            digest = token_digest(token)
+            started = time.perf_counter()
+            await connection.execute(
+                select(RevokedToken.id).where(
+                    RevokedToken.token_digest == digest
+                )
+            )
+            samples.append(time.perf_counter() - started)
+    await get_engine().dispose()
+    return summarize(samples, args.rows, "db")
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment()
+    if args.mode == "memory":
+        report = bench_memory(args)
+    else:
+        report = asyncio.run(bench_db(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
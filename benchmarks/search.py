@@ -0,0 +1,113 @@
+# Задержка нечеткого поиска по названиям (TitleSearchIndex.search) на
+# большом каталоге. Индекс заполняется напрямую, без БД: названия собираются
+# из случайных слов словаря, запросы - это названия из индекса с опечаткой
+# и без нее.
+#
+# Результат печатается в JSON: p50/p95/p99 в миллисекундах. Если p99 больше
+# --target-ms, скрипт завершается с кодом 1.
+#
+# Запуск из корня репозитория модулем, чтобы импортировался all_in_one:
+#     python -m benchmarks.search --titles 1000000
+
+
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+WORD_COUNT = 20_000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--target-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def configure_environment() -> None:
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+    os.environ.setdefault("SYNC_DATABASE_URL", "postgresql://benchmark")
+    os.environ.setdefault(
+        "ASYNC_DATABASE_URL", "postgresql+asyncpg://benchmark"
+    )
+
+
+def make_words(rng: random.Random) -> list[str]:
+    return [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+        for _ in range(WORD_COUNT)
+    ]
+
+
+def make_title(rng: random.Random, words: list[str]) -> str:
+    return " ".join(rng.choices(words, k=rng.randint(2, 5))).capitalize()
+
+
+def with_typo(rng: random.Random, title: str) -> str:
+    # Одна замена буквы: типичная опечатка в запросе.
+    position = rng.randrange(len(title))
+    return (
+        title[:position]
+        + rng.choice(string.ascii_lowercase)
+        + title[position + 1 :]
+    )
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment()
+    from all_in_one.core.config import settings
+    from all_in_one.modules.content.search import TitleSearchIndex
+
+    rng = random.Random(args.seed)
+    words = make_words(rng)
+    index = TitleSearchIndex(settings.SEARCH_MAX_CANDIDATES)
+    started = time.perf_counter()
+    titles = []
+    for media_id in range(1, args.titles + 1):
+        title = make_title(rng, words)
+        index.add(media_id, title)
+        titles.append(title)
+    build_seconds = time.perf_counter() - started
+
+    queries = [
+        with_typo(rng, title) if i % 2 else title
+        for i, title in enumerate(rng.choices(titles, k=args.queries))
+    ]
+    index.search(queries[0], args.limit)
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, args.limit)
+        samples.append(time.perf_counter() - started)
+
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    p99_ms = cuts[98] * 1e3
+    report = {
+        "titles": args.titles,
+        "queries": len(samples),
+        "build_seconds": round(build_seconds, 1),
+        "mean_ms": round(statistics.fmean(samples) * 1e3, 3),
+        "p50_ms": round(cuts[49] * 1e3, 3),
+        "p95_ms": round(cuts[94] * 1e3, 3),
+        "p99_ms": round(p99_ms, 3),
+        "max_ms": round(max(samples) * 1e3, 3),
+        "target_p99_ms": args.target_ms,
+        "ok": p99_ms <= args.target_ms,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
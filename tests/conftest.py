@@ -0,0 +1,62 @@
+# Общие фикстуры тестов. Тесты с БД работают только с отдельной тестовой
+# базой из TEST_DATABASE_URL (postgresql+asyncpg://...): схема в ней
+# пересоздается на каждый тест. Без TEST_DATABASE_URL такие тесты
+# пропускаются.
+#
+#     TEST_DATABASE_URL=postgresql+asyncpg://postgres@localhost/app_test \
+#         python -m pytest -q
+
+
+import importlib
+import os
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+# Настройки читаются при первом обращении, поэтому окружение достаточно
+# подготовить до запуска тестов.
+os.environ["ASYNC_DATABASE_URL"] = (
+    TEST_DATABASE_URL or "postgresql+asyncpg://test@localhost/test"
+)
+os.environ.setdefault("SYNC_DATABASE_URL", "postgresql://test")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test")
+os.environ["TELEGRAM_MODE"] = "disabled"
+os.environ.pop("REPLICA_DATABASE_URL", None)
+
+# Все модели импортируются заранее, как в приложении: связи между ними
+# разрешаются по именам классов, а create_all создает только импортированные
+# таблицы.
+MODEL_MODULES = (
+    "all_in_one.modules.auth.models",
+    "all_in_one.modules.content.models",
+    "all_in_one.modules.jobs.models",
+    "all_in_one.modules.likes.models",
+)
+for module in MODEL_MODULES:
+    importlib.import_module(module)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+    from all_in_one.core.db import Base, async_session, get_engine
+
+    engine = get_engine()
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    session = async_session()
+    try:
+        yield session
+    finally:
+        await session.close()
+        # Пул привязан к циклу событий теста.
+        await engine.dispose()
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from all_in_one.core.conditional import Validators, etag_matches, make_etag
+
+UPDATED_ON = datetime(2024, 6, 1, 12, 0, 0, 500000)
+LAST_MODIFIED = "Sat, 01 Jun 2024 12:00:00 GMT"
+ETAG = make_etag("item", 1, UPDATED_ON)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.state.renders = 0
+
+    @app.get("/item")
+    def item(request: Request):
+        def render():
+            app.state.renders += 1
+            return JSONResponse({"id": 1})
+
+        return Validators(ETAG, UPDATED_ON).response(request, render)
+
+    return TestClient(app)
+
+
+def test_response_carries_validators(client):
+    response = client.get("/item")
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 1}
+    assert response.headers["etag"] == ETAG
+    assert response.headers["last-modified"] == LAST_MODIFIED
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+@pytest.mark.parametrize(
+    "if_none_match", [ETAG, ETAG.removeprefix("W/"), f'"other", {ETAG}', "*"]
+)
+def test_matching_etag_returns_304_without_rendering(client, if_none_match):
+    response = client.get("/item", headers={"If-None-Match": if_none_match})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == ETAG
+    assert client.app.state.renders == 0
+
+
+def test_changed_etag_returns_body(client):
+    response = client.get("/item", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert client.app.state.renders == 1
+
+
+@pytest.mark.parametrize(
+    ("if_modified_since", "status_code"),
+    [
+        (LAST_MODIFIED, 304),
+        ("Sun, 02 Jun 2024 00:00:00 GMT", 304),
+        ("Sat, 01 Jun 2024 11:59:59 GMT", 200),
+        ("not a date", 200),
+    ],
+)
+def test_if_modified_since(client, if_modified_since, status_code):
+    response = client.get(
+        "/item", headers={"If-Modified-Since": if_modified_since}
+    )
+
+    assert response.status_code == status_code
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since(client):
+    response = client.get(
+        "/item",
+        headers={
+            "If-None-Match": '"stale"',
+            "If-Modified-Since": LAST_MODIFIED,
+        },
+    )
+
+    assert response.status_code == 200
+
+
+def test_etag_depends_on_every_part():
+    assert make_etag("item", 1, UPDATED_ON) == ETAG
+    assert make_etag("item", 2, UPDATED_ON) != ETAG
+    assert make_etag("item", 1, datetime(2024, 6, 2)) != ETAG
+    assert not etag_matches('W/"a", W/"b"', 'W/"c"')
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+from all_in_one.modules.auth.models import User
+from all_in_one.modules.auth.schemas import UserWithoutPassword
+from all_in_one.modules.content.models import Media
+from all_in_one.modules.content.utils import CategoryEnum
+from all_in_one.modules.export.exporter import export_lines
+from all_in_one.modules.likes.models import Likes
+
+pytestmark = pytest.mark.anyio
+
+CREATED_AT = datetime(2024, 1, 1, 12, 0, 0)
+
+
+async def seed(db) -> User:
+    await db.execute(
+        insert(User),
+        [
+            {
+                "id": user_id,
+                "username": f"user{user_id}",
+                "email": f"user{user_id}@example.com",
+                "hashed_password": "secret-hash",
+            }
+            for user_id in (1, 2)
+        ],
+    )
+    category = list(CategoryEnum)[0]
+    await db.execute(
+        insert(Media),
+        [
+            {
+                "id": media_id,
+                "title": f"media {media_id}",
+                "category": category,
+                "photo_video_url": f"/media/{media_id}",
+                "created_at": CREATED_AT,
+                "user_id": user_id,
+            }
+            for media_id, user_id in ((1, 1), (2, 2), (3, 1))
+        ],
+    )
+    await db.execute(
+        insert(Likes),
+        [
+            {"user_id": 1, "media_id": 2, "created_at": CREATED_AT},
+            {"user_id": 2, "media_id": 1, "created_at": CREATED_AT},
+            {"user_id": 1, "media_id": 3, "created_at": CREATED_AT},
+        ],
+    )
+    await db.commit()
+    return (await db.execute(select(User).where(User.id == 1))).scalar_one()
+
+
+async def test_export_streams_only_own_data_as_ndjson(db):
+    user = await seed(db)
+    profile = UserWithoutPassword.model_validate(user)
+
+    body = b"".join(
+        [chunk async for chunk in export_lines(profile, user.id, False)]
+    )
+
+    assert body.endswith(b"\n")
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert [line["type"] for line in lines] == [
+        "profile",
+        "media",
+        "media",
+        "like",
+        "like",
+    ]
+    assert lines[0]["data"]["username"] == "user1"
+    assert "hashed_password" not in lines[0]["data"]
+    assert [line["data"]["id"] for line in lines[1:3]] == [1, 3]
+    assert [line["data"]["media_id"] for line in lines[3:]] == [2, 3]
+    assert lines[3]["data"]["created_at"] == "2024-01-01T12:00:00"
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from all_in_one.modules.jobs.models import Job
+from all_in_one.modules.jobs.repositories import (
+    claim_jobs,
+    complete_job,
+    enqueue_job,
+    fail_job,
+    heartbeat_jobs,
+    release_job,
+    requeue_stale_jobs,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def get_job(db, job_id: int) -> Job:
+    db.expire_all()
+    return (await db.execute(select(Job).where(Job.id == job_id))).scalar_one()
+
+
+async def age_lock(db, job_id: int, seconds: float) -> None:
+    await db.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .values(locked_at=datetime.utcnow() - timedelta(seconds=seconds))
+    )
+    await db.commit()
+
+
+async def test_claim_gives_each_job_to_one_worker(db):
+    for i in range(3):
+        await enqueue_job(db, "test.job", {"i": i}, max_attempts=3)
+
+    first = await claim_jobs(db, "default", 2, "worker-1")
+    second = await claim_jobs(db, "default", 2, "worker-2")
+
+    assert len(first) == 2
+    assert len(second) == 1
+    assert not {job.id for job in first} & {job.id for job in second}
+    job = await get_job(db, second[0].id)
+    assert (job.status, job.locked_by, job.attempts) == (
+        "running",
+        "worker-2",
+        1,
+    )
+    assert await claim_jobs(db, "default", 2, "worker-3") == []
+
+
+async def test_dedup_key_enqueues_once(db):
+    assert await enqueue_job(db, "test.job", dedup_key="slot") is not None
+    assert await enqueue_job(db, "test.job", dedup_key="slot") is None
+
+
+async def test_stale_job_is_requeued_or_failed(db):
+    retried = await enqueue_job(db, "test.job", max_attempts=2)
+    exhausted = await enqueue_job(db, "test.job", max_attempts=1)
+    await claim_jobs(db, "default", 2, "worker-1")
+    for job_id in (retried, exhausted):
+        await age_lock(db, job_id, 120)
+
+    locked_before = datetime.utcnow() - timedelta(seconds=60)
+    assert await requeue_stale_jobs(db, locked_before) == 2
+
+    job = await get_job(db, retried)
+    assert (job.status, job.locked_by) == ("queued", None)
+    assert (await get_job(db, exhausted)).status == "failed"
+
+
+async def test_heartbeat_keeps_running_job_from_requeue(db):
+    job_id = await enqueue_job(db, "test.job")
+    await claim_jobs(db, "default", 1, "worker-1")
+    await age_lock(db, job_id, 120)
+
+    assert await heartbeat_jobs(db, [job_id], "worker-1") == {job_id}
+    assert await heartbeat_jobs(db, [job_id], "worker-2") == set()
+
+    locked_before = datetime.utcnow() - timedelta(seconds=60)
+    assert await requeue_stale_jobs(db, locked_before) == 0
+    assert (await get_job(db, job_id)).status == "running"
+
+
+async def test_only_lock_owner_finishes_job(db):
+    job_id = await enqueue_job(db, "test.job", max_attempts=3)
+    await claim_jobs(db, "default", 1, "worker-1")
+    # Блокировка истекла, задачу забрал другой воркер.
+    await age_lock(db, job_id, 120)
+    await requeue_stale_jobs(db, datetime.utcnow())
+    await claim_jobs(db, "default", 1, "worker-2")
+
+    await complete_job(db, job_id, "worker-1")
+    await fail_job(db, job_id, "worker-1", 1, 3, "late", 0)
+    await release_job(db, job_id, "worker-1")
+    job = await get_job(db, job_id)
+    assert (job.status, job.locked_by, job.attempts) == (
+        "running",
+        "worker-2",
+        2,
+    )
+
+    await complete_job(db, job_id, "worker-2")
+    job = await get_job(db, job_id)
+    assert (job.status, job.locked_by) == ("done", None)
+    assert job.finished_at is not None
+
+
+async def test_release_returns_job_without_counting_attempt(db):
+    job_id = await enqueue_job(db, "test.job")
+    await claim_jobs(db, "default", 1, "worker-1")
+
+    await release_job(db, job_id, "worker-1")
+
+    job = await get_job(db, job_id)
+    assert (job.status, job.attempts, job.locked_by) == ("queued", 0, None)
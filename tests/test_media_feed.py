@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from all_in_one.modules.auth.models import User
+from all_in_one.modules.content.dependencies import (
+    decode_cursor,
+    encode_cursor,
+    get_media_page,
+)
+from all_in_one.modules.content.models import Media
+from all_in_one.modules.content.utils import CategoryEnum
+
+CREATED_AT = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(CREATED_AT, 42)
+
+    assert decode_cursor(cursor) == (CREATED_AT, 42)
+
+
+@pytest.mark.parametrize("cursor", ["***", "bm90IGEgY3Vyc29y", ""])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as err:
+        decode_cursor(cursor)
+
+    assert err.value.status_code == 400
+
+
+async def seed_media(db) -> None:
+    await db.execute(
+        insert(User),
+        [
+            {
+                "id": 1,
+                "username": "author",
+                "email": "author@example.com",
+                "hashed_password": "x",
+            },
+            {
+                "id": 2,
+                "username": "disabled",
+                "email": "disabled@example.com",
+                "hashed_password": "x",
+                "disabled": True,
+            },
+        ],
+    )
+    categories = list(CategoryEnum)
+    # Пары с одинаковым created_at: порядок внутри пары задает id.
+    await db.execute(
+        insert(Media),
+        [
+            {
+                "id": media_id,
+                "title": f"media {media_id}",
+                "category": categories[media_id % 2],
+                "photo_video_url": f"/media/{media_id}",
+                "created_at": CREATED_AT + timedelta(minutes=media_id // 2),
+                "user_id": 1,
+            }
+            for media_id in range(1, 12)
+        ]
+        + [
+            {
+                "id": 100,
+                "title": "hidden",
+                "category": categories[0],
+                "photo_video_url": "/media/100",
+                "created_at": CREATED_AT,
+                "user_id": 2,
+            }
+        ],
+    )
+    await db.commit()
+
+
+@pytest.mark.anyio
+async def test_pages_cover_feed_once_in_order(db):
+    await seed_media(db)
+
+    seen, cursor = [], None
+    while True:
+        items, cursor = await get_media_page(db, 4, cursor)
+        seen += [item.id for item in items]
+        if cursor is None:
+            break
+
+    assert seen == sorted(
+        range(1, 12),
+        key=lambda media_id: (media_id // 2, media_id),
+        reverse=True,
+    )
+
+
+@pytest.mark.anyio
+async def test_category_filter(db):
+    await seed_media(db)
+    category = list(CategoryEnum)[1]
+
+    items, cursor = await get_media_page(db, 20, category=category)
+
+    assert cursor is None
+    assert [item.id for item in items] == [11, 9, 7, 5, 3, 1]
+    assert all(item.user.username == "author" for item in items)
@@ -0,0 +1,51 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from all_in_one.core.config import get_settings
+from all_in_one.modules.monitoring.routers import router
+
+TOKEN = "internal-token"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(get_settings(), "INTERNAL_API_TOKEN", TOKEN)
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/api/internal/hashing/"])
+def test_internal_endpoints_are_hidden_without_configured_token(client, path):
+    response = client.get(path, headers={"Authorization": f"Bearer {TOKEN}"})
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {},
+        {"Authorization": "Bearer wrong"},
+        {"Authorization": f"Basic {TOKEN}"},
+    ],
+)
+def test_internal_endpoints_require_token(client, token, headers):
+    response = client.get("/api/internal/hashing/", headers=headers)
+
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_internal_endpoints_accept_token(client, token):
+    response = client.get(
+        "/api/internal/hashing/", headers={"Authorization": f"Bearer {TOKEN}"}
+    )
+
+    assert response.status_code == 200
+    assert "calls" in response.json()
@@ -0,0 +1,71 @@
+import pytest
+
+from all_in_one.core.responses import PATHSEND_EXTENSION, PathSendFileResponse
+
+pytestmark = pytest.mark.anyio
+
+BODY = b"0123456789" * 10
+
+
+def make_scope(extensions: dict, method="GET", headers=()) -> dict:
+    return {
+        "type": "http",
+        "method": method,
+        "headers": [
+            (name.encode(), value.encode()) for name, value in headers
+        ],
+        "extensions": extensions,
+    }
+
+
+async def call(response, scope) -> list[dict]:
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await response(scope, receive, send)
+    return messages
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(BODY)
+    return path
+
+
+async def test_file_is_sent_by_path_when_server_supports_pathsend(path):
+    messages = await call(
+        PathSendFileResponse(path), make_scope({PATHSEND_EXTENSION: {}})
+    )
+
+    assert [message["type"] for message in messages] == [
+        "http.response.start",
+        PATHSEND_EXTENSION,
+    ]
+    assert messages[0]["status"] == 200
+    assert (b"content-length", str(len(BODY)).encode()) in messages[0][
+        "headers"
+    ]
+    assert messages[1]["path"] == str(path)
+
+
+@pytest.mark.parametrize(
+    "extensions, method, headers",
+    [
+        ({}, "GET", ()),
+        ({PATHSEND_EXTENSION: {}}, "HEAD", ()),
+        ({PATHSEND_EXTENSION: {}}, "GET", (("range", "bytes=0-9"),)),
+    ],
+)
+async def test_falls_back_to_chunked_body(path, extensions, method, headers):
+    messages = await call(
+        PathSendFileResponse(path), make_scope(extensions, method, headers)
+    )
+
+    assert PATHSEND_EXTENSION not in [message["type"] for message in messages]
+    assert messages[-1]["type"] == "http.response.body"
@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from sqlalchemy import func, insert, select
+
+from all_in_one.modules.auth.models import RevokedToken
+from all_in_one.modules.auth.revocation import RevocationCache, token_digest
+
+pytestmark = pytest.mark.anyio
+
+
+def make_token(subject: str, expires_in: float = 3600) -> str:
+    return jwt.encode(
+        {"sub": subject, "exp": int(time.time() + expires_in)}, "test"
+    )
+
+
+async def db_now(db) -> datetime:
+    return (
+        await db.execute(select(func.timezone("UTC", func.now())))
+    ).scalar_one()
+
+
+async def test_revocation_reaches_other_worker_on_sync(db):
+    token = make_token("alice")
+    revoking, other = RevocationCache(), RevocationCache()
+    await other.sync(db)
+
+    await revoking.revoke(token, db)
+
+    assert revoking.is_revoked(token)
+    assert not other.is_revoked(token)
+    await other.sync(db)
+    assert other.is_revoked(token)
+
+
+async def test_first_sync_loads_all_live_revocations(db):
+    live, expired = make_token("live"), make_token("expired")
+    now = await db_now(db)
+    await db.execute(
+        insert(RevokedToken),
+        [
+            {
+                "token_digest": token_digest(live),
+                "expires_at": now + timedelta(hours=1),
+                "revoked_at": now - timedelta(days=30),
+            },
+            {
+                "token_digest": token_digest(expired),
+                "expires_at": now - timedelta(seconds=1),
+                "revoked_at": now - timedelta(days=30),
+            },
+        ],
+    )
+    await db.commit()
+
+    cache = RevocationCache()
+    await cache.sync(db)
+
+    assert cache.is_revoked(live)
+    assert not cache.is_revoked(expired)
+    assert len(cache) == 1
+
+
+async def test_sync_picks_up_revocation_committed_out_of_order(db):
+    # Отзыв получил revoked_at до предыдущей синхронизации, но закоммитился
+    # после нее: перекрытие окна должно его подхватить.
+    cache = RevocationCache()
+    await cache.sync(db)
+    token = make_token("late")
+    now = await db_now(db)
+    await db.execute(
+        insert(RevokedToken).values(
+            token_digest=token_digest(token),
+            expires_at=now + timedelta(hours=1),
+            revoked_at=now - timedelta(seconds=30),
+        )
+    )
+    await db.commit()
+
+    await cache.sync(db)
+
+    assert cache.is_revoked(token)
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from all_in_one.modules.utils.telegram_outbox import OutboxFull, TelegramOutbox
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeBot:
+    def __init__(self, errors: dict[str, list[Exception]] | None = None):
+        self.errors = errors or {}
+        self.sent: list[tuple[str, str, float]] = []
+        self.started = time.monotonic()
+
+    async def send_message(self, chat_id: str, text: str) -> None:
+        self.sent.append((chat_id, text, time.monotonic() - self.started))
+        errors = self.errors.get(text)
+        if errors:
+            raise errors.pop(0)
+
+
+def make_outbox(**overrides) -> TelegramOutbox:
+    options = {
+        "global_rate": 1000,
+        "per_chat_interval": 0,
+        "concurrency": 4,
+        "max_retries": 3,
+        "maxsize": 100,
+    }
+    options.update(overrides)
+    return TelegramOutbox(**options)
+
+
+async def drain(outbox: TelegramOutbox, timeout: float = 2) -> None:
+    deadline = time.monotonic() + timeout
+    while outbox.depth and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    await outbox.stop()
+
+
+async def test_identical_pending_messages_are_coalesced():
+    outbox, bot = make_outbox(), FakeBot()
+    for _ in range(3):
+        await outbox.send("1", "hello")
+    await outbox.send("2", "hello")
+    outbox.start(bot)
+    await drain(outbox)
+
+    assert sorted(chat for chat, _, _ in bot.sent) == ["1", "2"]
+    assert outbox.stats()["coalesced"] == 2
+
+
+async def test_message_can_be_repeated_after_delivery():
+    outbox, bot = make_outbox(), FakeBot()
+    outbox.start(bot)
+    await outbox.send("1", "hello")
+    await drain(outbox)
+    outbox.start(bot)
+    await outbox.send("1", "hello")
+    await drain(outbox)
+
+    assert len(bot.sent) == 2
+    assert outbox.stats()["coalesced"] == 0
+
+
+async def test_full_outbox_rejects_new_messages():
+    outbox = make_outbox(maxsize=2)
+    await outbox.send("1", "a")
+    await outbox.send("1", "b")
+
+    with pytest.raises(OutboxFull):
+        await outbox.send("1", "c")
+    # Уже ожидающее сообщение склеивается и в полной очереди.
+    await outbox.send("1", "a")
+
+
+async def test_messages_to_one_chat_are_spaced():
+    outbox, bot = make_outbox(per_chat_interval=0.2), FakeBot()
+    await outbox.send("1", "a")
+    await outbox.send("1", "b")
+    await outbox.send("2", "c")
+    outbox.start(bot)
+    await drain(outbox)
+
+    sent_at = {text: at for _, text, at in bot.sent}
+    assert sent_at["b"] - sent_at["a"] >= 0.2
+    assert sent_at["c"] < 0.2
+
+
+async def test_unexpected_error_fails_message_and_frees_key():
+    outbox = make_outbox()
+    bot = FakeBot({"boom": [RuntimeError("unexpected")]})
+    outbox.start(bot)
+    await outbox.send("1", "boom")
+    await drain(outbox)
+    outbox.start(bot)
+    await outbox.send("1", "boom")
+    await drain(outbox)
+
+    assert len(bot.sent) == 2
+    assert outbox.stats()["failed"] == 1
+    assert outbox.stats()["sent"] == 1
+
+
+async def test_retry_after_pauses_whole_outbox():
+    outbox = make_outbox(concurrency=1)
+    bot = FakeBot({"flood": [RetryAfter(1)]})
+    await outbox.send("1", "flood")
+    await outbox.send("2", "other")
+    outbox.start(bot)
+    await drain(outbox, timeout=3)
+
+    sent_at = {}
+    for _, text, at in bot.sent:
+        sent_at.setdefault(text, []).append(at)
+    assert len(sent_at["flood"]) == 2
+    assert sent_at["other"][0] >= 1
+    assert outbox.stats()["retried"] == 1
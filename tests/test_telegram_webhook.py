@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from telegram import Bot
+
+from all_in_one.core.config import get_settings
+from all_in_one.modules.utils import telegram_webhook
+from all_in_one.modules.utils.telegram_webhook import (
+    SECRET_TOKEN_HEADER,
+    UpdateDispatcher,
+)
+
+pytestmark = pytest.mark.anyio
+
+SECRET = "webhook-secret"
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": 42, "type": "private"},
+        "text": "/start",
+    },
+}
+
+
+class FakeApplication:
+    def __init__(self, blocked: bool = False):
+        self.bot = Bot("123:abc")
+        self.updates = []
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def process_update(self, update) -> None:
+        self.updates.append(update)
+        await self.unblocked.wait()
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    dispatcher = UpdateDispatcher(maxsize=10, workers=1)
+    monkeypatch.setattr(
+        telegram_webhook, "get_update_dispatcher", lambda: dispatcher
+    )
+    monkeypatch.setattr(get_settings(), "TELEGRAM_WEBHOOK_SECRET", SECRET)
+    return dispatcher
+
+
+@pytest.fixture
+async def client():
+    app = FastAPI()
+    app.include_router(telegram_webhook.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test"
+    ) as client:
+        yield client
+
+
+async def post_update(client, body=UPDATE, secret: str | None = SECRET):
+    headers = {SECRET_TOKEN_HEADER: secret} if secret is not None else {}
+    if isinstance(body, bytes):
+        return await client.post(
+            "/api/telegram/webhook/", content=body, headers=headers
+        )
+    return await client.post(
+        "/api/telegram/webhook/", json=body, headers=headers
+    )
+
+
+async def wait_until(condition, timeout: float = 2) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def test_webhook_is_not_found_without_running_dispatcher(
+    dispatcher, client
+):
+    response = await post_update(client)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("secret", [None, "wrong"])
+async def test_webhook_rejects_bad_secret_token(dispatcher, client, secret):
+    dispatcher.start(FakeApplication())
+    try:
+        response = await post_update(client, secret=secret)
+    finally:
+        await dispatcher.stop()
+
+    assert response.status_code == 403
+    assert dispatcher.depth == 0
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"[1, 2]"])
+async def test_webhook_rejects_malformed_body(dispatcher, client, body):
+    dispatcher.start(FakeApplication())
+    try:
+        response = await post_update(client, body)
+    finally:
+        await dispatcher.stop()
+
+    assert response.status_code == 400
+    assert dispatcher.depth == 0
+
+
+async def test_webhook_hands_update_to_dispatcher(dispatcher, client):
+    application = FakeApplication()
+    dispatcher.start(application)
+    try:
+        response = await post_update(client)
+        await wait_until(lambda: dispatcher.processed)
+    finally:
+        await dispatcher.stop()
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert [update.update_id for update in application.updates] == [1]
+    assert application.updates[0].message.text == "/start"
+
+
+async def test_webhook_returns_503_when_queue_is_full(dispatcher, client):
+    dispatcher.maxsize = 1
+    application = FakeApplication(blocked=True)
+    dispatcher.start(application)
+    try:
+        # Первое обновление занимает единственный обработчик, второе
+        # заполняет очередь.
+        assert (await post_update(client)).status_code == 200
+        await wait_until(lambda: application.updates)
+        assert (await post_update(client)).status_code == 200
+        response = await post_update(client)
+    finally:
+        await dispatcher.stop()
+
+    assert response.status_code == 503
+    assert dispatcher.rejected == 1